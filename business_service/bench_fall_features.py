@@ -0,0 +1,125 @@
+"""
+Per-frame cost of the fall features: the old per-person loop vs fall_features.
+
+    python bench_fall_features.py --people 1 10 50 --frames 500
+
+Both paths see the same synthetic people walking (and some falling) across
+the frame; every output of the batched kernel is checked against the
+per-person one before timings are printed.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from fall_features import fall_features
+
+
+def get_midpoint(pt1, pt2):
+    return [(pt1[0] + pt2[0]) / 2, (pt1[1] + pt2[1]) / 2]
+
+
+def calculate_angle_to_vertical(center_8, ankle_mid):
+    vector = np.array(center_8) - np.array(ankle_mid)
+    vertical = np.array([0, -1])
+    vector_norm = np.linalg.norm(vector)
+    if vector_norm == 0:
+        return 0.0
+    cos_theta = np.dot(vector, vertical) / vector_norm
+    return np.degrees(np.arccos(np.clip(cos_theta, -1.0, 1.0)))
+
+
+def scalar_features(keypoints, ids, previous_centers, t):
+    """The per-person path data2result used before the batched kernel."""
+    out = []
+    for kps, idx in zip(keypoints, ids):
+        sd_l, sd_r, h_l, h_r, k_l, k_r, a_l, a_r = kps[:8]
+        center = np.mean([sd_l, sd_r, h_l, h_r, k_l, k_r, a_l, a_r], axis=0).tolist()
+        ankle_mid = get_midpoint(a_l, a_r)
+        shoulders_mid = get_midpoint(sd_l, sd_r)
+        velocity = 0.0
+        if idx in previous_centers:
+            prev_center, prev_time = previous_centers[idx]
+            if t - prev_time > 0:
+                velocity = np.linalg.norm(np.array(shoulders_mid) - np.array(prev_center)) / (t - prev_time)
+        previous_centers[idx] = (shoulders_mid, t)
+        angle = calculate_angle_to_vertical(center, ankle_mid)
+        out.append((center, shoulders_mid, ankle_mid, velocity, angle))
+    return [np.array(column, dtype=np.float64) for column in zip(*out)]
+
+
+def make_frames(people, frames, fps, rng):
+    """Standing skeletons drifting sideways; every fifth person tips over half way."""
+    skeleton = np.array([[-15, 0], [15, 0], [-10, 60], [10, 60],
+                         [-10, 110], [10, 110], [-10, 160], [10, 160]], dtype=np.float64)
+    origin = rng.uniform([50, 50], [600, 200], (people, 2))
+    speed = rng.uniform(-60, 60, (people, 2))
+    fallers = np.arange(people) % 5 == 0
+    out = []
+    for f in range(frames):
+        t = f / fps
+        tilt = np.where(fallers & (f > frames // 2), np.pi / 2 * min(1.0, (f - frames // 2) / fps), 0.0)
+        rot = np.stack([np.cos(tilt), -np.sin(tilt), np.sin(tilt), np.cos(tilt)], axis=1).reshape(-1, 2, 2)
+        kps = origin[:, None] + speed[:, None] * t + skeleton @ rot.transpose(0, 2, 1)
+        kps += rng.normal(0, 1, kps.shape)
+        out.append((t, kps.astype(np.float32)))
+    return out
+
+
+def run_scalar(frames, ids):
+    previous_centers = {}
+    results = []
+    start = time.perf_counter()
+    for t, kps in frames:
+        results.append(scalar_features(kps, ids, previous_centers, t))
+    return time.perf_counter() - start, results
+
+
+def run_batched(frames, ids):
+    prev_center = np.zeros((len(ids), 2), dtype=np.float32)
+    prev_time = np.full(len(ids), np.nan)
+    results = []
+    start = time.perf_counter()
+    for t, kps in frames:
+        features = fall_features(kps, prev_center, prev_time, t)
+        prev_center[:] = features.shoulders_mid
+        prev_time[:] = t
+        results.append(list(features))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--fps", type=float, default=20.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'people':>7} {'loop us':>9} {'batched us':>11} {'speedup':>8} {'max diff':>10} {'same falls':>11}")
+    for people in args.people:
+        frames = make_frames(people, args.frames, args.fps, rng)
+        ids = list(range(people))
+        scalar_s, expected = run_scalar(frames, ids)
+        batched_s, actual = run_batched(frames, ids)
+
+        max_diff = 0.0
+        same_falls = True
+        for want, got in zip(expected, actual):
+            for a, b in zip(want, got):
+                # values end up in float32 detection records
+                assert np.allclose(a, b, rtol=1e-6, atol=1e-4), (a, b)
+                max_diff = max(max_diff, float(np.abs(a - b).max()))
+            # the thresholds detect_fall applies to the features
+            same_falls &= np.array_equal(want[4] > 50, got[4] > 50)
+            same_falls &= np.array_equal(want[3] >= 200, got[3] >= 200)
+        assert same_falls
+
+        scalar_us = 1e6 * scalar_s / args.frames
+        batched_us = 1e6 * batched_s / args.frames
+        print(f"{people:>7} {scalar_us:>9.1f} {batched_us:>11.1f} {scalar_us / batched_us:>7.1f}x "
+              f"{max_diff:>10.2e} {str(same_falls):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+frame_info encode + decode cost: JSON lists vs the binary detection records.
+
+    python bench_frame_codec.py --people 1 10 50
+
+Each round does what one hop of the pipeline does: decode the incoming
+frame_info and encode the outgoing one.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import frame_codec
+
+
+def make_frame_info(people, rng):
+    objects = frame_codec.empty_objects(people)
+    objects["id"] = np.arange(people)
+    objects["bbox"] = rng.integers(0, 640, (people, 4))
+    objects["bbox_conf"] = rng.random(people)
+    objects["keypoints"] = rng.random((people, frame_codec.NUM_KEYPOINTS, 2)) * 640
+    objects["keypoints_conf"] = rng.random((people, frame_codec.NUM_KEYPOINTS))
+    return {"time": "2024-01-01 00:00:00.000000", "starttime": time.time(), "fps": 20.0, "objects": objects}
+
+
+def bench(frame_info, fmt, rounds):
+    raw = frame_codec.encode(frame_info, fmt)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        raw = frame_codec.encode(frame_codec.decode(raw), fmt)
+    return 1e6 * (time.perf_counter() - start) / rounds, len(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'people':>7} {'json us':>9} {'json bytes':>11} {'binary us':>10} {'binary bytes':>13} {'speedup':>8}")
+    for people in args.people:
+        frame_info = make_frame_info(people, rng)
+        json_us, json_bytes = bench(frame_info, frame_codec.JSON, args.rounds)
+        binary_us, binary_bytes = bench(frame_info, frame_codec.BINARY, args.rounds)
+        print(f"{people:>7} {json_us:>9.1f} {json_bytes:>11} {binary_us:>10.1f} {binary_bytes:>13} "
+              f"{json_us / binary_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import json
+import queue
+import threading
+import time
+
+from logs.log_handler import logger
+
+CHANNEL = "update_info"
+ADD = "add"
+REMOVE = "remove"
+
+
+class CameraUpdates(threading.Thread):
+    """
+    Listens on the `update_info` channel the camera service is driven by and
+    queues (action, camera_info) for cameras that are added, updated or
+    deleted: `add` and `update` become ADD, `delete` becomes REMOVE. The
+    owner applies them with `pending()` from its own loop, so nothing is
+    changed from under it. Pub/sub does not keep messages, so anything
+    published while the service is down is lost; startup still uses the
+    configured cameras.
+    """
+
+    def __init__(self, conn, channel=CHANNEL):
+        super().__init__(daemon=True, name="camera-updates")
+        self.conn = conn
+        self.channel = channel
+        self.updates = queue.Queue()
+
+    def run(self):
+        while True:
+            try:
+                pubsub = self.conn.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.handle(message)
+            except Exception as e:
+                logger.error(f"Listening on {self.channel} failed, subscribing again: {e}")
+                time.sleep(1.0)
+
+    def handle(self, message):
+        if message.get("type") != "message":
+            return
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid message on {self.channel}: {e}")
+            return
+        if data.get("type") != "camera" or "id" not in data:
+            return
+        action = {"add": ADD, "update": ADD, "delete": REMOVE}.get(data.get("action"))
+        if action is None:
+            return
+        logger.info(f"Camera {data['id']}: {data['action']}")
+        self.updates.put((action, data))
+
+    def pending(self):
+        """Queued (action, camera_info) updates, oldest first, without blocking."""
+        updates = []
+        while True:
+            try:
+                updates.append(self.updates.get_nowait())
+            except queue.Empty:
+                return updates
@@ -26,6 +26,25 @@ cfg = load_config()
 REDIS_HOSTNAME = cfg["redis"]["HOSTNAME"]
 REDIS_PORT = cfg["redis"]["PORT"]
 STREAMMAXLEN = cfg["stream"]["STREAMMAXLEN"]
+FRAME_CODEC = cfg["stream"]["frame_codec"]
+READ_POLICY = cfg["stream"]["read_policy"]
+READ_BLOCK_MS = cfg["stream"]["block_ms"]
+READ_GROUP = cfg["stream"]["consumer_group"]
 CAMERAS = cfg["cameras"]
 
+TRACK_CAPACITY = cfg["tracks"]["capacity"]
+VELOCITY_WINDOW = cfg["tracks"]["velocity_window"]
+TRACK_TTL = cfg["tracks"]["ttl"]
+
+HISTORY_FLUSH_INTERVAL = cfg["history"]["flush_interval"]
+HISTORY_MAX_BYTES = cfg["history"]["max_bytes"]
+HISTORY_BACKUPS = cfg["history"]["backups"]
+
+LATENCY_LOG_INTERVAL = cfg["latency"]["log_interval"]
+
+PUBLISH_MAX_BATCH = cfg["publisher"]["max_batch"]
+PUBLISH_FLUSH_MS = cfg["publisher"]["flush_ms"]
+PUBLISH_MAX_QUEUE = cfg["publisher"]["max_queue"]
+PUBLISH_STATS_INTERVAL = cfg["publisher"]["stats_interval"]
+
  
\ No newline at end of file
@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Keypoint order of the 8-point pose model
+SHOULDER_L, SHOULDER_R, HIP_L, HIP_R, KNEE_L, KNEE_R, ANKLE_L, ANKLE_R = range(8)
+
+FallFeatures = namedtuple("FallFeatures", ["center", "shoulders_mid", "ankle_mid", "velocity", "angle_to_vertical"])
+
+
+def fall_features(keypoints, prev_center, prev_time, t):
+    """
+    Geometry used by fall detection for every person of a frame in one pass.
+
+    keypoints is (N, 8, 2); prev_center (N, 2) and prev_time (N,) are the
+    previous shoulder midpoints of the same people (prev_time NaN when there
+    is none). Velocity is the shoulder-midpoint speed in px/s, 0 without a
+    previous center or when no time has passed. angle_to_vertical is the
+    angle in degrees between the ankle-to-center vector and the image's up
+    direction, 0 when the two points coincide.
+    """
+    # stays in the keypoint dtype (float32 records) like the per-person path did
+    kps = np.asarray(keypoints)[:, :8]
+    center = kps.mean(axis=1)
+    shoulders_mid = (kps[:, SHOULDER_L] + kps[:, SHOULDER_R]) / 2
+    ankle_mid = (kps[:, ANKLE_L] + kps[:, ANKLE_R]) / 2
+
+    dt = t - np.asarray(prev_time, dtype=np.float64)
+    moved = dt > 0  # False for NaN, i.e. first sighting
+    displacement = shoulders_mid - prev_center
+    velocity = np.zeros(len(kps))
+    velocity[moved] = np.sqrt((displacement[moved] ** 2).sum(axis=1)) / dt[moved]
+
+    # the angle is sensitive near vertical, so it is computed in float64
+    vector = center.astype(np.float64) - ankle_mid
+    norm = np.sqrt((vector ** 2).sum(axis=1))
+    angle = np.zeros(len(kps))
+    upright = norm > 0
+    # dot product with the vertical (0, -1) of the y-down image
+    angle[upright] = np.degrees(np.arccos(np.clip(-vector[upright, 1] / norm[upright], -1.0, 1.0)))
+
+    return FallFeatures(center, shoulders_mid, ankle_mid, velocity, angle)
@@ -0,0 +1,92 @@
+import json
+import struct
+from functools import lru_cache
+
+import numpy as np
+
+BINARY = "binary"
+JSON = "json"
+
+MAGIC = b"FIB1"
+HEADER = struct.Struct("<4sHII")  # magic, num_keypoints, meta length, object count
+NUM_KEYPOINTS = 8
+
+
+@lru_cache(maxsize=None)
+def detection_dtype(num_keypoints=NUM_KEYPOINTS):
+    """One fixed-layout record per person, shared by every stage of the pipeline."""
+    return np.dtype([
+        ("id", "<i8"),
+        ("class", "<i4"),
+        ("bbox", "<i4", (4,)),
+        ("bbox_conf", "<f4"),
+        ("keypoints", "<f4", (num_keypoints, 2)),
+        ("keypoints_conf", "<f4", (num_keypoints,)),
+        ("center", "<f4", (2,)),
+        ("velocity", "<f4"),
+        ("angle_to_vertical", "<f4"),
+        ("fall_detected", "?"),
+    ])
+
+
+def empty_objects(count=0, num_keypoints=NUM_KEYPOINTS):
+    return np.zeros(count, dtype=detection_dtype(num_keypoints))
+
+
+def objects_to_array(objects, num_keypoints=None):
+    """Converts a list of object dicts (the JSON layout) into a detection array."""
+    if isinstance(objects, np.ndarray):
+        return objects
+    if num_keypoints is None:
+        num_keypoints = len(objects[0]["keypoints"]) if objects else NUM_KEYPOINTS
+    array = empty_objects(len(objects), num_keypoints)
+    for row, obj in zip(array, objects):
+        for name in array.dtype.names:
+            value = obj.get(name)
+            if value is not None:
+                row[name] = value
+    return array
+
+
+def array_to_objects(array):
+    """Converts a detection array into a list of plain dicts for JSON."""
+    return [
+        {name: row[name].tolist() for name in array.dtype.names}
+        for row in array
+    ]
+
+
+def encode(frame_info, fmt=BINARY):
+    """Serializes frame_info; `objects`, if present, must be a detection array or list of dicts."""
+    meta = {key: value for key, value in frame_info.items() if key != "objects"}
+    objects = frame_info.get("objects")
+    if fmt == JSON:
+        if objects is not None:
+            meta["objects"] = array_to_objects(objects_to_array(objects))
+        return json.dumps(meta)
+
+    objects = objects_to_array(objects if objects is not None else [])
+    num_keypoints = objects.dtype["keypoints"].shape[0]
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    header = HEADER.pack(MAGIC, num_keypoints, len(meta_bytes), len(objects))
+    return b"".join([header, meta_bytes, objects.tobytes()])
+
+
+def decode(raw):
+    """Inverse of `encode` for either format; `objects` always comes back as a detection array."""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if not raw.startswith(MAGIC):
+        frame_info = json.loads(raw)
+        if "objects" in frame_info:
+            frame_info["objects"] = objects_to_array(frame_info["objects"])
+        return frame_info
+
+    _, num_keypoints, meta_len, count = HEADER.unpack_from(raw)
+    offset = HEADER.size
+    frame_info = json.loads(raw[offset:offset + meta_len])
+    offset += meta_len
+    # copy so stages can write results into the records they received
+    frame_info["objects"] = np.frombuffer(raw, dtype=detection_dtype(num_keypoints),
+                                          count=count, offset=offset).copy()
+    return frame_info
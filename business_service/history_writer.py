@@ -0,0 +1,77 @@
+import os
+import json
+import queue
+import threading
+
+from logs.log_handler import logger
+
+
+class HistoryWriter(threading.Thread):
+    """
+    Append-only JSONL writer that keeps file I/O off the detection loop.
+
+    `append` only puts the record on a bounded queue (records are dropped and
+    counted when it is full). A background thread writes them in batches every
+    `flush_interval` seconds and rotates the file once it grows past
+    `max_bytes`, keeping `backups` old files (`path.1` is the newest).
+    """
+
+    def __init__(self, path, flush_interval=1.0, max_bytes=10 * 1024 * 1024, backups=5, max_queue=10000):
+        super().__init__(daemon=True, name=f"history-{path}")
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stopped = threading.Event()
+        self.dropped = 0
+        self.written = 0
+
+    def append(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def drain(self):
+        records = []
+        while True:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def flush(self):
+        records = self.drain()
+        if not records:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+                size = f.tell()
+            self.written += len(records)
+            if self.max_bytes and size >= self.max_bytes:
+                self.rotate()
+        except OSError as e:
+            logger.error(f"Failed to write {len(records)} history records to {self.path}: {e}")
+
+    def run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        else:
+            self.flush()
@@ -1,4 +1,5 @@
 import sys
+import time
 import signal
 import multiprocessing
 from multiprocessing import Process
@@ -6,6 +7,7 @@ from multiprocessing import Process
 import redis
 from config.loader import REDIS_HOSTNAME, REDIS_PORT, CAMERAS
 from fall_detect import Falling
+from camera_updates import CameraUpdates, ADD, REMOVE
 
 
 
@@ -20,17 +22,37 @@ signal.signal(signal.SIGINT, signal_handler)
 r = redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
 
 def run_falling(camera_info):
+    # terminate() sends SIGTERM; exit normally so pending history gets flushed
+    signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
     falling = Falling(camera_info["id"])
-    falling.run(r)
+    try:
+        falling.run(r)
+    finally:
+        falling.close()
+
+def start_falling(camera_info):
+    p = Process(target=run_falling, args=(camera_info,))
+    p.start()
+    return p
 
 
 if __name__ == "__main__":
-    processes = list()
+    processes = dict()
 
     for camera_info in CAMERAS:
-        p = Process(target=run_falling, args=(camera_info,))
-        p.start()
-        processes.append(p)
-
-    for process in processes:
-        process.join()
+        processes[camera_info["id"]] = start_falling(camera_info)
+
+    # Cameras added or deleted at runtime get a process started or stopped
+    updates = CameraUpdates(r)
+    updates.start()
+    while True:
+        for action, camera_info in updates.pending():
+            camera_id = camera_info["id"]
+            if action == ADD and camera_id not in processes:
+                processes[camera_id] = start_falling(camera_info)
+            elif action == REMOVE and camera_id in processes:
+                p = processes.pop(camera_id)
+                p.terminate()
+                p.join()
+                r.delete(f"fall_cam:{camera_id}")
+        time.sleep(0.5)
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TrackTable:
+    """
+    Fixed-size per-track state for fall detection.
+
+    Every track owns one row (slot) of preallocated NumPy arrays. Velocity
+    samples and shoulder heights go into per-row ring buffers, so updates are
+    O(1) and detection only looks at the last `window` samples. Slots are kept
+    in an OrderedDict ordered by last sighting; tracks unseen for `ttl`
+    seconds are expired from its front, and when the table is full the least
+    recently seen track is evicted. Memory is bounded by `capacity`.
+    """
+
+    def __init__(self, capacity=256, window=30, shoulder_window=128, shoulder_seconds=2.0,
+                 sample_interval=1.0, ttl=30.0):
+        self.capacity = capacity
+        self.window = window
+        self.shoulder_window = shoulder_window
+        self.shoulder_seconds = shoulder_seconds
+        self.sample_interval = sample_interval
+        self.ttl = ttl
+
+        self.prev_center = np.zeros((capacity, 2), dtype=np.float64)
+        self.prev_time = np.zeros(capacity, dtype=np.float64)
+        self.velocities = np.zeros((capacity, window), dtype=np.float64)
+        self.velocity_count = np.zeros(capacity, dtype=np.int64)
+        self.last_sample_time = np.zeros(capacity, dtype=np.float64)
+        self.shoulder_t = np.zeros((capacity, shoulder_window), dtype=np.float64)
+        self.shoulder_y = np.zeros((capacity, shoulder_window), dtype=np.float64)
+        self.shoulder_count = np.zeros(capacity, dtype=np.int64)
+        self.fallen = np.zeros(capacity, dtype=bool)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+
+        self.slots = OrderedDict()  # track_id -> slot, least recently seen first
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, track_id):
+        return track_id in self.slots
+
+    def release(self, track_id):
+        slot = self.slots.pop(track_id)
+        self.velocity_count[slot] = 0
+        self.shoulder_count[slot] = 0
+        self.fallen[slot] = False
+        self.free.append(slot)
+
+    def expire(self, now):
+        while self.slots:
+            track_id, slot = next(iter(self.slots.items()))
+            if now - self.last_seen[slot] <= self.ttl:
+                break
+            self.release(track_id)
+
+    def slot(self, track_id, now):
+        """Returns the slot of `track_id`, allocating one for new tracks, and marks it as seen."""
+        slot = self.slots.get(track_id)
+        if slot is None:
+            if not self.free:
+                self.release(next(iter(self.slots)))
+            slot = self.free.pop()
+            self.slots[track_id] = slot
+            self.prev_time[slot] = np.nan  # no previous center yet
+        else:
+            self.slots.move_to_end(track_id)
+        self.last_seen[slot] = now
+        return slot
+
+    def add_velocity(self, slot, velocity, t):
+        """Keeps at most one velocity sample per `sample_interval`; returns True if it was kept."""
+        count = self.velocity_count[slot]
+        if count and t - self.last_sample_time[slot] < self.sample_interval:
+            return False
+        self.velocities[slot, count % self.window] = velocity
+        self.velocity_count[slot] = count + 1
+        self.last_sample_time[slot] = t
+        return True
+
+    def velocity_window(self, slot):
+        """The last `window` velocity samples of a track, oldest first."""
+        count = self.velocity_count[slot]
+        if count <= self.window:
+            return self.velocities[slot, :count]
+        head = count % self.window
+        return np.concatenate([self.velocities[slot, head:], self.velocities[slot, :head]])
+
+    def add_shoulder(self, slot, t, y):
+        count = self.shoulder_count[slot]
+        self.shoulder_t[slot, count % self.shoulder_window] = t
+        self.shoulder_y[slot, count % self.shoulder_window] = y
+        self.shoulder_count[slot] = count + 1
+
+    def shoulder_window_ys(self, slot, now):
+        """Shoulder heights of the last `shoulder_seconds`, oldest first."""
+        count = min(self.shoulder_count[slot], self.shoulder_window)
+        start = self.shoulder_count[slot] - count
+        order = (start + np.arange(count)) % self.shoulder_window
+        ts = self.shoulder_t[slot, order]
+        return self.shoulder_y[slot, order][now - ts <= self.shoulder_seconds]
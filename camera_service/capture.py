@@ -0,0 +1,228 @@
+import time
+import random
+import threading
+
+import cv2
+
+from logs.log_handler import logger
+
+
+CONNECTED = "connected"  # frames are flowing
+DEGRADED = "degraded"  # connection open, but reads are failing
+DOWN = "down"  # not connected, reconnecting with backoff
+
+
+def open_capture(source, hw_acceleration=True, open_timeout_ms=None, read_timeout_ms=None):
+    """
+    Opens `source`, asking FFmpeg for any available hardware decoder when
+    supported. The timeouts bound how long opening and each read may block
+    on an unresponsive stream (OpenCV's FFmpeg default is 30 s).
+    """
+    if not isinstance(source, str):
+        return cv2.VideoCapture(source)
+    params = []
+    if open_timeout_ms and hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout_ms)]
+    if read_timeout_ms and hasattr(cv2, "CAP_PROP_READ_TIMEOUT_MSEC"):
+        params += [cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout_ms)]
+    if hw_acceleration and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG,
+                               params + [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    if params:
+        return cv2.VideoCapture(source, cv2.CAP_FFMPEG, params)
+    return cv2.VideoCapture(source)
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter: the n-th delay is drawn from
+    [d / 2, d] with d = min(cap, base * 2 ** n), so cameras that failed
+    together spread their retries instead of reconnecting in lockstep.
+    """
+
+    def __init__(self, base=0.5, cap=30.0):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next(self):
+        delay = min(self.cap, self.base * 2 ** self.attempts)
+        self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+
+def resize_frame(frame, width=None, height=None):
+    if width is None and height is None:
+        return frame
+    src_height, src_width = frame.shape[:2]
+    if width is None:
+        width = round(src_width * height / src_height)
+    elif height is None:
+        height = round(src_height * width / src_width)
+    if (width, height) == (src_width, src_height):
+        return frame
+    interpolation = cv2.INTER_AREA if width < src_width else cv2.INTER_LINEAR
+    return cv2.resize(frame, (width, height), interpolation=interpolation)
+
+
+def crop_rois(full, output_shape, rois, max_side=None):
+    """
+    Crops of `rois` (normalized x1, y1, x2, y2) from the full-resolution
+    frame, at most `max_side` pixels on their longer side. Each comes with
+    where it sits in the published frame: x, y of its top-left corner in
+    published pixels and scale, the crop pixels per published pixel.
+    """
+    height, width = full.shape[:2]
+    ratio = output_shape[1] / width  # published pixels per source pixel
+    crops = []
+    for x1, y1, x2, y2 in rois:
+        left, top = int(x1 * width), int(y1 * height)
+        right, bottom = int(round(x2 * width)), int(round(y2 * height))
+        if right <= left or bottom <= top:
+            continue
+        crop = full[top:bottom, left:right]
+        if max_side and max(crop.shape[:2]) > max_side:
+            if crop.shape[1] >= crop.shape[0]:
+                crop = resize_frame(crop, width=max_side)
+            else:
+                crop = resize_frame(crop, height=max_side)
+        crops.append((crop, {"x": left * ratio, "y": top * output_shape[0] / height,
+                             "scale": crop.shape[1] / ((right - left) * ratio)}))
+    return crops
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Keeps an RTSP/video source drained on its own thread.
+
+    Every frame is `grab()`bed so the socket never backs up, but only frames
+    that pass the `target_fps` gate are `retrieve()`d (decoded) and resized.
+    Configured `rois` are cropped from the frame before it is resized, so
+    they keep the source resolution (up to `roi_max_side`). The newest
+    decoded frame waits in a one-slot buffer for `read`; if it is replaced
+    before being read it is counted as dropped.
+
+    After `max_read_failures` failed reads in a row the source is reopened,
+    with exponential backoff between attempts. `reconnect_slots`, a
+    semaphore shared by all cameras, caps how many reopen at the same time,
+    so a site-wide network blip does not become a reconnect storm. The
+    connection state (CONNECTED, DEGRADED, DOWN) is kept in `health`.
+    """
+
+    def __init__(self, camera_id, source, target_fps=25, output_width=None, output_height=None,
+                 hw_acceleration=True, rois=None, roi_max_side=None, open_timeout_ms=None, read_timeout_ms=None,
+                 max_read_failures=3, backoff_base=0.5, backoff_cap=30.0, reconnect_slots=None):
+        super().__init__(daemon=True, name=f"grabber-{camera_id}")
+        self.camera_id = camera_id
+        self.source = source
+        self.interval = 1.0 / target_fps if target_fps else 0.0
+        self.output_width = output_width
+        self.output_height = output_height
+        self.hw_acceleration = hw_acceleration
+        self.rois = rois or []
+        self.roi_max_side = roi_max_side
+        self.open_timeout_ms = open_timeout_ms
+        self.read_timeout_ms = read_timeout_ms
+        self.max_read_failures = max_read_failures
+        self.backoff = Backoff(backoff_base, backoff_cap)
+        self.reconnect_slots = reconnect_slots
+        self.counters = {"grabbed": 0, "decoded": 0, "published": 0, "dropped": 0, "read_errors": 0,
+                         "reconnects": 0}
+        self.health = {"state": DOWN, "since": time.time(), "reason": "starting"}
+        self.health_version = 0  # bumped on every state change
+        self.latest = None
+        self.cond = threading.Condition()
+        self.stopped = threading.Event()
+
+    def set_state(self, state, reason=""):
+        if state == self.health["state"]:
+            return
+        self.health = {"state": state, "since": time.time(), "reason": reason}
+        self.health_version += 1
+        log = logger.info if state == CONNECTED else logger.warning
+        log(f"Camera {self.camera_id} {state}{': ' + reason if reason else ''}")
+
+    def connect(self, first):
+        """Opens the source, after a backoff delay unless `first`; None once stopped."""
+        delay = 0.0 if first else self.backoff.next()
+        while not self.stopped.wait(delay):
+            if self.reconnect_slots is not None:
+                if not self.reconnect_slots.acquire(timeout=1.0):
+                    delay = 0.0  # all slots busy; check `stopped` and wait again
+                    continue
+            try:
+                cap = open_capture(self.source, self.hw_acceleration, self.open_timeout_ms, self.read_timeout_ms)
+            finally:
+                if self.reconnect_slots is not None:
+                    self.reconnect_slots.release()
+            if cap.isOpened():
+                if not first:
+                    self.counters["reconnects"] += 1
+                return cap
+            cap.release()
+            delay = self.backoff.next()
+            self.set_state(DOWN, f"open failed, retrying in {delay:.1f}s")
+        return None
+
+    def run(self):
+        cap = self.connect(first=True)
+        connected_at = time.time()
+        failures = 0
+        next_due = 0.0
+        while cap is not None and not self.stopped.is_set():
+            if not cap.grab():
+                failures += 1
+                self.counters["read_errors"] += 1
+                if failures < self.max_read_failures:
+                    self.set_state(DEGRADED, f"{failures} failed read(s)")
+                    continue
+                cap.release()
+                # a connection that held for a while starts the backoff over
+                if time.time() - connected_at > self.backoff.cap:
+                    self.backoff.reset()
+                self.set_state(DOWN, f"{failures} failed reads, reconnecting")
+                cap = self.connect(first=False)
+                connected_at = time.time()
+                failures = 0
+                continue
+            failures = 0
+            self.set_state(CONNECTED)
+            self.counters["grabbed"] += 1
+
+            now = time.time()
+            if now < next_due:
+                continue
+            next_due = max(next_due + self.interval, now)
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            self.counters["decoded"] += 1
+            full = frame
+            frame = resize_frame(frame, self.output_width, self.output_height)
+            rois = crop_rois(full, frame.shape, self.rois, self.roi_max_side) if self.rois else []
+
+            with self.cond:
+                if self.latest is not None:
+                    self.counters["dropped"] += 1
+                self.latest = (frame, now, rois)
+                self.cond.notify()
+        if cap is not None:
+            cap.release()
+
+    def read(self, timeout=1.0):
+        """Returns (frame, grab_time, rois) of the newest decoded frame, or None on timeout."""
+        with self.cond:
+            if self.latest is None:
+                self.cond.wait(timeout)
+            item, self.latest = self.latest, None
+        return item
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from multiprocessing import Process, Queue
+
+from logs.log_handler import logger
+
+PROCESS_PER_CAMERA = "process"
+THREADS = "threads"
+ADD = "add"
+REMOVE = "remove"
+
+
+class ProcessPerCamera:
+    """One OS process per camera running `target(camera_info, *args)`; `remove` terminates it and waits."""
+
+    def __init__(self, target, args=()):
+        self.target = target
+        self.args = args
+        self.processes = {}
+
+    def add(self, camera_info):
+        self.remove(camera_info["id"])
+        p = Process(target=self.target, args=(camera_info, *self.args))
+        p.start()
+        self.processes[camera_info["id"]] = p
+
+    def remove(self, camera_id, timeout=10.0):
+        p = self.processes.pop(camera_id, None)
+        if p is not None:
+            p.terminate()
+            # The caller deletes the camera's keys next, nothing may write them after that
+            p.join(timeout)
+            if p.is_alive():
+                logger.warning(f"Camera {camera_id} process did not exit within {timeout:.0f}s")
+
+    def join(self):
+        for p in list(self.processes.values()):
+            p.join()
+
+
+def run_worker(target, args, commands, acks, initializer):
+    """
+    Body of a CapturePool process: one thread per camera, started and
+    stopped by `commands`. Every REMOVE is acknowledged on `acks` once the
+    camera's thread has stopped.
+    """
+    if initializer is not None:
+        initializer()
+    threads = {}  # camera_id -> (thread, stop event)
+    while True:
+        action, payload = commands.get()
+        if action == ADD:
+            camera_id = payload["id"]
+            stop_camera(threads, camera_id)
+            stop = threading.Event()
+            thread = threading.Thread(target=target, args=(payload, *args), kwargs={"stop": stop},
+                                      daemon=True, name=f"camera-{camera_id}")
+            thread.start()
+            threads[camera_id] = (thread, stop)
+        elif action == REMOVE:
+            stop_camera(threads, payload)
+            acks.put(payload)
+
+
+def stop_camera(threads, camera_id, timeout=5.0):
+    if camera_id not in threads:
+        return
+    thread, stop = threads.pop(camera_id)
+    stop.set()
+    # the same camera may be added again right away; it must not publish twice
+    thread.join(timeout)
+    if thread.is_alive():
+        logger.warning(f"Camera {camera_id} did not stop within {timeout:.0f}s")
+
+
+class CapturePool:
+    """
+    Spreads cameras over `workers` processes, each running one capture
+    thread per camera: `target(camera_info, *args, stop=event)`. Decoding
+    and JPEG encoding release the GIL, so a few processes serve many
+    cameras without the interpreter, cv2 and a Redis connection per camera.
+    `initializer()` runs once in every worker before its first camera,
+    e.g. to open the connection the threads share.
+
+    A new camera goes to the worker with the fewest cameras. Cameras do not
+    move between workers; a camera thread that dies stays dead until the
+    camera is added again. `remove` returns once the camera's thread has
+    stopped, so its keys can be deleted right after.
+    """
+
+    def __init__(self, target, workers=2, args=(), initializer=None):
+        self.commands = [Queue() for _ in range(max(1, int(workers)))]
+        self.acks = [Queue() for _ in self.commands]
+        self.processes = [Process(target=run_worker, args=(target, args, commands, acks, initializer),
+                                  name=f"capture-worker-{i}")
+                          for i, (commands, acks) in enumerate(zip(self.commands, self.acks))]
+        self.assigned = {}  # camera_id -> worker index
+        for p in self.processes:
+            p.start()
+
+    def add(self, camera_info):
+        camera_id = camera_info["id"]
+        if camera_id not in self.assigned:
+            loads = [0] * len(self.commands)
+            for index in self.assigned.values():
+                loads[index] += 1
+            self.assigned[camera_id] = loads.index(min(loads))
+        self.commands[self.assigned[camera_id]].put((ADD, camera_info))
+
+    def remove(self, camera_id, timeout=10.0):
+        index = self.assigned.pop(camera_id, None)
+        if index is None:
+            return
+        self.commands[index].put((REMOVE, camera_id))
+        deadline = time.time() + timeout
+        while True:
+            try:
+                # Acks of earlier removals that timed out may still be queued
+                if self.acks[index].get(timeout=max(0.0, deadline - time.time())) == camera_id:
+                    return
+            except queue.Empty:
+                logger.warning(f"Camera {camera_id} was not stopped within {timeout:.0f}s")
+                return
+
+    def join(self):
+        for p in self.processes:
+            p.join()
+
+
+def create(mode, target, workers=2, args=(), initializer=None):
+    """The capture layout for `mode`: PROCESS_PER_CAMERA or THREADS."""
+    if mode == PROCESS_PER_CAMERA:
+        return ProcessPerCamera(target, args)
+    if mode == THREADS:
+        return CapturePool(target, workers, args, initializer)
+    raise ValueError(f"Unknown capture mode: {mode}")
@@ -22,5 +22,28 @@ cfg = load_config()
 CAMERAS = cfg['cameras']
 STREAM_MAXLEN = cfg['stream']['maxlen']
 TARGET_FPS = cfg['stream']['target_fps']
+OUTPUT_WIDTH = cfg['capture']['output_width']
+OUTPUT_HEIGHT = cfg['capture']['output_height']
+HW_ACCELERATION = cfg['capture']['hw_acceleration']
+STATS_INTERVAL = cfg['capture']['stats_interval']
+ROI_MAX_SIDE = cfg['capture']['roi_max_side']
+OPEN_TIMEOUT_MS = cfg['reconnect']['open_timeout_ms']
+READ_TIMEOUT_MS = cfg['reconnect']['read_timeout_ms']
+MAX_READ_FAILURES = cfg['reconnect']['max_read_failures']
+BACKOFF_BASE = cfg['reconnect']['backoff_base']
+BACKOFF_CAP = cfg['reconnect']['backoff_cap']
+MAX_CONCURRENT_RECONNECTS = cfg['reconnect']['max_concurrent']
+HEALTH_TTL = cfg['reconnect']['health_ttl']
+CAPTURE_MODE = cfg['fan_in']['mode']
+CAPTURE_WORKERS = cfg['fan_in']['workers']
+WORKER_REDIS_CONNECTIONS = cfg['fan_in']['redis_connections']
+PUBLISH_MAX_BATCH = cfg['publisher']['max_batch']
+PUBLISH_FLUSH_MS = cfg['publisher']['flush_ms']
+PUBLISH_MAX_QUEUE = cfg['publisher']['max_queue']
+PUBLISH_STATS_INTERVAL = cfg['publisher']['stats_interval']
 REDIS_HOSTNAME = cfg['redis']['host_name']
-REDIS_PORT = cfg['redis']['port']
\ No newline at end of file
+REDIS_PORT = cfg['redis']['port']
+TRANSPORT_MODE = cfg['transport']['mode']
+SHM_SLOTS = cfg['transport']['slots']
+SHM_MAX_WIDTH = cfg['transport']['max_width']
+SHM_MAX_HEIGHT = cfg['transport']['max_height']
\ No newline at end of file
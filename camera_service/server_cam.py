@@ -7,11 +7,21 @@ import multiprocessing
 from multiprocessing import Process
 from utils import *
 import cv2
-from threading import Thread
+from threading import Thread, Lock
 import redis
 import numpy as np
 import time
 from config.loader import cfg, CAMERAS, STREAM_MAXLEN, REDIS_HOSTNAME, REDIS_PORT
+from config.loader import TRANSPORT_MODE, SHM_SLOTS, SHM_MAX_WIDTH, SHM_MAX_HEIGHT
+from config.loader import TARGET_FPS, OUTPUT_WIDTH, OUTPUT_HEIGHT, HW_ACCELERATION, STATS_INTERVAL, ROI_MAX_SIDE
+from config.loader import OPEN_TIMEOUT_MS, READ_TIMEOUT_MS, MAX_READ_FAILURES, BACKOFF_BASE, BACKOFF_CAP
+from config.loader import MAX_CONCURRENT_RECONNECTS, HEALTH_TTL
+from config.loader import CAPTURE_MODE, CAPTURE_WORKERS, WORKER_REDIS_CONNECTIONS
+from config.loader import PUBLISH_MAX_BATCH, PUBLISH_FLUSH_MS, PUBLISH_MAX_QUEUE, PUBLISH_STATS_INTERVAL
+from frame_transport import SharedFrameRing
+from publisher import StreamPublisher
+import capture_pool
+from capture import FrameGrabber, Backoff
 from logs.log_handler import logger
 
 
@@ -28,6 +38,8 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 conn = redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
+PUBLISHER = None
+PUBLISHER_LOCK = Lock()
 def calculate_gamma_from_histogram(frame):
     # Convert frame to grayscale
     gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -52,44 +64,105 @@ def adjust_image_gamma_lookuptable(image, gamma=1.0):
     # apply gamma correction using the lookup table
     return cv2.LUT(image, table)
 
-def add_frames(camera_info, cfg):
+def init_worker():
+    # Capture threads of a worker process share this pool instead of a connection each
+    global conn
+    conn = redis.Redis(connection_pool=redis.BlockingConnectionPool(
+        host=REDIS_HOSTNAME, port=REDIS_PORT, max_connections=WORKER_REDIS_CONNECTIONS))
+
+def get_publisher():
+    # One per process: frames of all cameras of a worker share its pipelined writes
+    global PUBLISHER
+    with PUBLISHER_LOCK:
+        if PUBLISHER is None:
+            PUBLISHER = StreamPublisher(conn, f"camera:{os.getpid()}", max_batch=PUBLISH_MAX_BATCH,
+                                        flush_ms=PUBLISH_FLUSH_MS, max_queue=PUBLISH_MAX_QUEUE,
+                                        stats_interval=PUBLISH_STATS_INTERVAL)
+            PUBLISHER.start()
+    return PUBLISHER
+
+def publish_health(p, camera_id, grabber):
+    # Expires unless refreshed, so a dead camera process does not stay "connected"
+    p.hset(f"camera_health:{camera_id}", mapping=dict(grabber.health, **grabber.counters))
+    p.expire(f"camera_health:{camera_id}", HEALTH_TTL)
+
+def add_frames(camera_info, cfg, reconnect_slots=None, stop=None):
     camera_id = camera_info['id']
-    cap = cv2.VideoCapture(camera_info["rtsp"])
-    # cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)  # Set timeout 5s
-    # cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-    # fr_count = 0
-    # tt_count = 0
-    # start_time = time.time()
-    # period_time = time.time()
+    grabber = FrameGrabber(camera_id, camera_info["rtsp"], target_fps=TARGET_FPS,
+                           output_width=OUTPUT_WIDTH, output_height=OUTPUT_HEIGHT,
+                           hw_acceleration=HW_ACCELERATION, rois=camera_info.get("rois"),
+                           roi_max_side=ROI_MAX_SIDE, open_timeout_ms=OPEN_TIMEOUT_MS,
+                           read_timeout_ms=READ_TIMEOUT_MS, max_read_failures=MAX_READ_FAILURES,
+                           backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP,
+                           reconnect_slots=reconnect_slots)
     logger.debug(f'Starting process to read camera id: {camera_id}')
+    ring = None
+    if TRANSPORT_MODE == "shm":
+        ring = SharedFrameRing(camera_id, slots=SHM_SLOTS, max_height=SHM_MAX_HEIGHT,
+                               max_width=SHM_MAX_WIDTH, create=True)
+    grabber.start()
+    publisher = get_publisher()
+    last_stats_time = 0.0
+    health_version = None
+    # Redis errors are retried with backoff instead of on every frame
+    errors = Backoff(BACKOFF_BASE, BACKOFF_CAP)
 
-    while True:
+    while stop is None or not stop.is_set():
         try:
-            ret, frame = cap.read()
-            if not ret:
-            # re-read camera since occur error
-                cap.release()
-                cap = cv2.VideoCapture(camera_info['rtsp'])
-                logger.debug(f'Read camera: {camera_id} error!')
+            if time.time() - last_stats_time >= STATS_INTERVAL or grabber.health_version != health_version:
+                last_stats_time = time.time()
+                health_version = grabber.health_version
+                p = conn.pipeline(transaction=False)
+                p.hset(f"capture_stats:{camera_id}", mapping=grabber.counters)
+                publish_health(p, camera_id, grabber)
+                p.execute()
+                logger.debug(f'Capture stats {camera_id}: {grabber.counters}')
+
+            item = grabber.read(timeout=1.0)
+            if item is None:
                 continue
+            frame, grab_time, rois = item
             # gamma_frame = calculate_gamma_from_histogram(frame)
             # gamma = (1/gamma_frame)
             # frame = adjust_image_gamma_lookuptable(frame, gamma)
-            frame = frame[::3, ::3]     
-            start_time=time.time()
-            frame_to_redis = serialize_img(frame)
+            start_time = grab_time
             current_datetime = datetime.datetime.now()
             frame_info = {"time": str(current_datetime),
                           "starttime": start_time}
-            result = {"frame": frame_to_redis,
-                      "frame_info": json.dumps(frame_info)}
-            conn.xadd(f"cam:{camera_info['id']}", result, maxlen=STREAM_MAXLEN) 
-            time.sleep(0.02)
+            if ring is not None:
+                # Raw pixels stay in shared memory, consumers encode only if they need bytes
+                frame_info["frame_ref"] = ring.write(frame)
+                frame_bytes = None
+            else:
+                frame_bytes = serialize_img(frame)
+            # Stage timestamps, extended by every service (see latency.py there)
+            frame_info["trace"] = {"camera.grabbed": grab_time, "camera.published": time.time()}
+            if rois:
+                # Full-resolution regions always travel as JPEG, next to the frame
+                frame_info["rois"] = [roi for _, roi in rois]
+            result = {"frame_info": json.dumps(frame_info)}
+            if frame_bytes is not None:
+                result["frame"] = frame_bytes
+            for i, (crop, _) in enumerate(rois):
+                result[f"roi_{i}"] = serialize_img(crop)
+            # Queued, never blocks: when Redis falls behind the oldest queued frames are dropped
+            publisher.publish(f"cam:{camera_info['id']}", result, maxlen=STREAM_MAXLEN)
+            grabber.counters["published"] += 1
+            errors.reset()
         except Exception as e:
-            print(e)
+            delay = errors.next()
+            logger.error(f"Camera {camera_id} publish failed, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+    # Only reached in thread mode, when the camera is removed
+    grabber.stop()
+    # Frames still queued would recreate cam:{id} once the listener deletes it
+    publisher.discard(f"cam:{camera_id}")
+    if ring is not None:
+        ring.close(unlink=True)
+    logger.debug(f'Stopped reading camera id: {camera_id}')
 
 def listening_update_info(conn,chanel):
-    global PROCESS
+    global CAPTURE
     logger.debug("Init listening_update_info")
     pubsub = conn.pubsub()
     pubsub.subscribe(chanel)
@@ -101,24 +174,16 @@ def listening_update_info(conn,chanel):
         if data["type"] == "camera":
             camera_id = data['id']
             if data["action"] == "add":
-                p = Process(target=add_frames, args=(data, cfg))
-                p.start()
-                PROCESS[camera_id] = p
-                # logger.debug(PROCESS)
+                CAPTURE.add(data)
             elif data["action"] == "update":
-                #terminal process
-                PROCESS[camera_id].terminate()
-                del PROCESS[camera_id]
-                conn.delete(f"camera:{camera_id}")
-                #add process
-                p = Process(target=add_frames, args=(data, cfg))
-                p.start()
-                PROCESS[camera_id] = p
-                logger.debug(PROCESS)
+                #stop camera
+                CAPTURE.remove(camera_id)
+                conn.delete(f"cam:{camera_id}")
+                #add camera
+                CAPTURE.add(data)
             elif data["action"] == "delete":
-                PROCESS[camera_id].terminate()
-                del PROCESS[camera_id]
-                conn.delete(f"camera:{camera_id}")
+                CAPTURE.remove(camera_id)
+                conn.delete(f"cam:{camera_id}", f"capture_stats:{camera_id}", f"camera_health:{camera_id}")
 if __name__ == "__main__":
     gate_info = {
         "gate_1": {
@@ -126,7 +191,8 @@ if __name__ == "__main__":
             "gate_name" : "GATE_1",
             "camera" : [
                 {"id": "CAM1",
-                "rtsp": "rtsp://rtsp_server:8554/cam1"
+                "rtsp": "rtsp://rtsp_server:8554/cam1",
+                # "rois": [[0.5, 0.0, 1.0, 0.5]],  # normalized x1, y1, x2, y2 sent at full resolution
                 # "rtsp": "C:\Users\ndhdu\Downloads\fall_detect\camera_service\camera1.mp4"
                 },
                 # {"id": "CAM2",
@@ -136,11 +202,13 @@ if __name__ == "__main__":
                 ]
             }
         }
-    PROCESS = {}
+    # Shared by all camera processes: at most this many reconnect at the same time
+    RECONNECT_SLOTS = multiprocessing.BoundedSemaphore(MAX_CONCURRENT_RECONNECTS)
+    # One process per camera, or cameras spread as threads over a few worker processes
+    CAPTURE = capture_pool.create(CAPTURE_MODE, add_frames, CAPTURE_WORKERS, args=(cfg, RECONNECT_SLOTS),
+                                  initializer=init_worker)
     for gate_id,data_gate_info in gate_info.items():
         for camera_info in data_gate_info["camera"]:
-            p = Process(target=add_frames, args=(camera_info , cfg))
-            p.start()
-            PROCESS[camera_info["id"]] = p
+            CAPTURE.add(camera_info)
     chanel = 'update_info'
     Thread(target = listening_update_info, args=(conn,chanel)).start()
\ No newline at end of file
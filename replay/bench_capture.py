@@ -0,0 +1,170 @@
+"""
+Memory and CPU of the camera service: one process per camera against
+capture threads fanned in over a few worker processes (fan_in.mode).
+
+    python replay/bench_capture.py --cameras 8 32 --duration 20
+    python replay/bench_capture.py --cameras 32 --workers 2 4 --video corridor.mp4
+
+For every camera count the camera stage of stages.py is started once per
+layout (`process`, then `threads` with each --workers value), publishing
+the same synthetic scenes (or --video files) to Redis. After --warmup
+seconds it measures for --duration seconds, over every process of the
+stage (launcher included):
+- PSS, which splits pages shared after fork between the processes, and
+  RSS summed as `ps` would show it;
+- CPU time as a percentage of one core;
+- frames published per camera per second, from capture_stats:{id}.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import redis
+
+from bench_pipeline import HERE, start_redis, stop_redis, stop, camera_sources
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def group_pids(pgid):
+    pids = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as stream:
+                fields = stream.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid:  # fields after the command name start at `state`
+            pids.append(int(name))
+    return pids
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as stream:
+        fields = stream.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+
+
+def memory_mb(pid):
+    """(PSS, RSS) of one process in MB."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as stream:
+            for line in stream:
+                name, _, rest = line.partition(":")
+                if name in ("Pss", "Rss"):
+                    values[name] = int(rest.split()[0]) / 1024.0
+    except OSError:
+        pass
+    return values.get("Pss", 0.0), values.get("Rss", 0.0)
+
+
+def sample(pgid):
+    """{pid: cpu seconds} and summed (PSS, RSS) of a process group."""
+    cpu, pss, rss = {}, 0.0, 0.0
+    for pid in group_pids(pgid):
+        try:
+            cpu[pid] = cpu_seconds(pid)
+        except OSError:
+            continue
+        process_pss, process_rss = memory_mb(pid)
+        pss += process_pss
+        rss += process_rss
+    return cpu, pss, rss
+
+
+def published(conn, cam_ids):
+    return {cam_id: int(conn.hget(f"capture_stats:{cam_id}", "published") or 0) for cam_id in cam_ids}
+
+
+def run_layout(count, mode, workers, host, port, args, log_dir):
+    conn = redis.Redis(host=host, port=port)
+    conn.flushall()
+    cam_ids = [f"REPLAY{i + 1}" for i in range(count)]
+    command = [sys.executable, os.path.join(HERE, "stages.py"), "camera", "--redis-host", host,
+               "--redis-port", str(port), "--cameras", *cam_ids, "--sources", *camera_sources(count, args),
+               "--capture-mode", mode]
+    if workers:
+        command += ["--capture-workers", str(workers)]
+    name = f"capture-{count}-{mode}{workers or ''}"
+    log = open(os.path.join(log_dir, f"{name}.log"), "w")
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        time.sleep(args.warmup)
+        if process.poll() is not None:
+            raise RuntimeError(f"camera stage exited early, see {log.name}")
+        cpu_before, _, _ = sample(process.pid)
+        frames_before, start = published(conn, cam_ids), time.time()
+        time.sleep(args.duration)
+        cpu_after, pss, rss = sample(process.pid)
+        frames_after, elapsed = published(conn, cam_ids), time.time() - start
+        processes = len(cpu_after)
+    finally:
+        stop([process])
+
+    cpu = sum(used - cpu_before.get(pid, 0.0) for pid, used in cpu_after.items())
+    fps = [(frames_after[cam_id] - frames_before[cam_id]) / elapsed for cam_id in cam_ids]
+    return {
+        "cameras": count,
+        "layout": f"{mode}" + (f" x{workers}" if workers else ""),
+        "processes": processes,
+        "pss_mb": pss,
+        "rss_mb": rss,
+        "cpu_percent": 100 * cpu / elapsed,
+        "fps_min": min(fps),
+        "fps_mean": sum(fps) / len(fps),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cameras", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2], help="worker processes tried in threads mode")
+    parser.add_argument("--video", nargs="+", default=None, help="replay these files instead of synthetic scenes")
+    parser.add_argument("--redis", default=None, help="host:port of a Redis to use instead of fakeredis")
+    parser.add_argument("--warmup", type=float, default=8.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--fps", type=float, default=5.0)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--json", default=None, help="write all results to this file")
+    parser.add_argument("--log-dir", default=None, help="stage logs, a temporary directory by default")
+    args = parser.parse_args()
+
+    host, port, server = start_redis(args.redis)
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="capture_logs_")
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Redis at {host}:{port}, stage logs in {log_dir}")
+
+    results = []
+    print(f"{'cameras':>7} {'layout':<12} {'procs':>5} {'PSS MB':>8} {'RSS MB':>8} {'CPU %':>6} "
+          f"{'fps min':>7} {'fps mean':>8}")
+    try:
+        for count in args.cameras:
+            layouts = [("process", None)] + [("threads", workers) for workers in args.workers]
+            for mode, workers in layouts:
+                result = run_layout(count, mode, workers, host, port, args, log_dir)
+                results.append(result)
+                print(f"{count:>7} {result['layout']:<12} {result['processes']:>5} {result['pss_mb']:>8.0f} "
+                      f"{result['rss_mb']:>8.0f} {result['cpu_percent']:>6.0f} {result['fps_min']:>7.1f} "
+                      f"{result['fps_mean']:>8.1f}")
+    except Exception as e:
+        print(f"FAIL {e}")
+        sys.exit(1)
+    finally:
+        stop_redis(server)
+
+    if args.json:
+        with open(args.json, "w") as stream:
+            json.dump(results, stream, indent=2)
+
+
+if __name__ == "__main__":
+    main()
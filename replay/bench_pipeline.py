@@ -0,0 +1,222 @@
+"""
+Offline throughput benchmark of the whole pipeline: camera -> tracking ->
+business -> visualization, without cameras or a GPU.
+
+    python replay/bench_pipeline.py --cameras 1 4 8 --duration 20
+    python replay/bench_pipeline.py --video corridor.mp4 --cameras 2 --redis 127.0.0.1:6379
+    python replay/bench_pipeline.py --cameras 4 --min-fps 15 --max-p95-ms 400 --json result.json
+
+For every camera count all four stages are started fresh (see stages.py)
+with their real code and config. The frames are synthetic scenes, or the
+--video files replayed at their own frame rate and looped. The pose model
+is StubPoseModel, with --image-ms/--call-ms standing in for model cost.
+Redis is an in-process fakeredis TCP server unless --redis points at a
+real one. Every stage's database writes go to that Redis only.
+
+After --warmup seconds it measures for --duration seconds:
+- fps: frames per camera reaching the visualization viewer (min / mean
+  over cameras);
+- per-stage latency from the frame traces, p50 as the median over
+  cameras, p95/p99 as the worst camera;
+- RSS and CPU per stage (summed over a stage's processes).
+
+--min-fps and --max-p95-ms turn it into a pass/fail check that exits with
+status 1 when any camera count misses them.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import redis
+
+from stages import STATS_KEY, EPOCH_KEY
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["camera", "tracking", "business", "visualization"]
+
+
+def start_redis(address):
+    """
+    (host, port, server) of the Redis to use. Without `address` an
+    in-process fakeredis server is started; pass it to stop_redis.
+    """
+    if address:
+        host, _, port = address.partition(":")
+        return host, int(port or 6379), None
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True  # open client connections must not keep the harness alive
+    threading.Thread(target=server.serve_forever, daemon=True, name="fakeredis").start()
+    host, port = server.server_address
+    return host, port, server
+
+
+def stop_redis(server):
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+def launch(stage, host, port, cam_ids, args, log_dir):
+    command = [sys.executable, os.path.join(HERE, "stages.py"), stage, "--redis-host", host,
+               "--redis-port", str(port), "--cameras", *cam_ids]
+    if stage == "camera":
+        command += ["--sources", *camera_sources(len(cam_ids), args)]
+    if stage == "tracking":
+        command += ["--people", str(args.people), "--image-ms", str(args.image_ms), "--call-ms", str(args.call_ms)]
+    log = open(os.path.join(log_dir, f"{stage}-{len(cam_ids)}.log"), "w")
+    # own process group, so the stage's per-camera children are stopped with it
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def camera_sources(count, args):
+    if args.video:
+        return [os.path.abspath(args.video[i % len(args.video)]) for i in range(count)]
+    return [f"synthetic://{args.width}x{args.height}@{args.fps:g}?people={args.people}"] * count
+
+
+def stop(processes):
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.time() + 5
+    for process in processes:
+        try:
+            process.wait(max(0.1, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def read_stats(conn):
+    return {name.decode(): json.loads(value) for name, value in conn.hgetall(STATS_KEY).items()}
+
+
+def by_stage(stats, field):
+    return {stage: sum(value[field] for name, value in stats.items() if name.split(":")[0] == stage)
+            for stage in STAGES}
+
+
+def stage_latency(summary):
+    """{stage: (p50, p95, p99)} over cameras: median p50, worst p95 and p99."""
+    stages = {}
+    for per_camera in summary.values():
+        for stage, values in per_camera.items():
+            stages.setdefault(stage, []).append(values)
+    return {stage: (statistics.median(v["p50"] for v in values), max(v["p95"] for v in values),
+                    max(v["p99"] for v in values))
+            for stage, values in stages.items()}
+
+
+def run_count(count, host, port, args, log_dir):
+    conn = redis.Redis(host=host, port=port)
+    conn.flushall()
+    cam_ids = [f"REPLAY{i + 1}" for i in range(count)]
+    processes = [launch(stage, host, port, cam_ids, args, log_dir) for stage in STAGES]
+    try:
+        time.sleep(args.warmup)
+        failed = [stage for stage, process in zip(STAGES, processes) if process.poll() is not None]
+        if failed:
+            raise RuntimeError(f"stages exited early: {failed}, see logs in {log_dir}")
+        conn.set(EPOCH_KEY, time.time())
+        time.sleep(1.5)  # every reporter sees the new epoch and writes once more
+        before, start = read_stats(conn), time.time()
+        time.sleep(args.duration)
+        after, elapsed = read_stats(conn), time.time() - start
+    finally:
+        stop(processes)
+
+    viewer = after.get("visualization", {})
+    frames_before = before.get("visualization", {}).get("frames", {})
+    fps = [(frames - frames_before.get(cam_id, 0)) / elapsed for cam_id, frames in viewer.get("frames", {}).items()]
+    cpu_before = by_stage(before, "cpu_s")
+    cpu = {stage: 100 * (used - cpu_before[stage]) / elapsed for stage, used in by_stage(after, "cpu_s").items()}
+    return {
+        "cameras": count,
+        "fps_min": min(fps) if fps else 0.0,
+        "fps_mean": statistics.mean(fps) if fps else 0.0,
+        "latency_ms": stage_latency(viewer.get("latency", {})),
+        "rss_mb": by_stage(after, "rss_mb"),
+        "cpu_percent": cpu,
+    }
+
+
+def print_result(result):
+    total = result["latency_ms"].get("total", (float("nan"),) * 3)
+    rss, cpu = result["rss_mb"], result["cpu_percent"]
+    print(f"\n{result['cameras']} camera(s): {result['fps_min']:.1f} min / {result['fps_mean']:.1f} mean fps, "
+          f"end-to-end p50/p95/p99 {total[0]:.0f}/{total[1]:.0f}/{total[2]:.0f} ms")
+    print(f"  {'stage':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for stage, (p50, p95, p99) in result["latency_ms"].items():
+        if stage != "total":
+            print(f"  {stage:<24} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+    print(f"  {'service':<24} {'RSS MB':>8} {'CPU %':>8}")
+    for stage in STAGES:
+        print(f"  {stage:<24} {rss[stage]:>8.0f} {cpu[stage]:>8.0f}")
+
+
+def check(result, args):
+    failures = []
+    if args.min_fps is not None and result["fps_min"] < args.min_fps:
+        failures.append(f"{result['cameras']} camera(s): min fps {result['fps_min']:.1f} < {args.min_fps}")
+    p95 = result["latency_ms"].get("total", (0, float("inf")))[1]
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        failures.append(f"{result['cameras']} camera(s): end-to-end p95 {p95:.0f} ms > {args.max_p95_ms} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--video", nargs="+", default=None, help="replay these files instead of synthetic scenes")
+    parser.add_argument("--redis", default=None, help="host:port of a Redis to use instead of fakeredis")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--image-ms", type=float, default=10.0, help="stub model cost per image")
+    parser.add_argument("--call-ms", type=float, default=5.0, help="stub model cost per predict call")
+    parser.add_argument("--min-fps", type=float, default=None, help="fail if any camera is slower")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="fail if end-to-end p95 is higher")
+    parser.add_argument("--json", default=None, help="write all results to this file")
+    parser.add_argument("--log-dir", default=None, help="stage logs, a temporary directory by default")
+    args = parser.parse_args()
+
+    host, port, server = start_redis(args.redis)
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="replay_logs_")
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Redis at {host}:{port}, stage logs in {log_dir}")
+
+    results, failures = [], []
+    try:
+        for count in args.cameras:
+            result = run_count(count, host, port, args, log_dir)
+            print_result(result)
+            results.append(result)
+            failures += check(result, args)
+    except Exception as e:
+        failures.append(f"{count} camera(s): {e}")
+    finally:
+        stop_redis(server)
+
+    if args.json:
+        with open(args.json, "w") as stream:
+            json.dump(results, stream, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Frame sources for the replay harness, opened in place of RTSP URLs."""
+import time
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+
+SYNTHETIC = "synthetic"
+
+
+def people_at(t, count, width, height, seed=0):
+    """
+    (count, 4) xyxy boxes of people walking back and forth across a
+    `width` x `height` scene at time `t`. The synthetic source draws them
+    and the stub model "detects" them, so both agree without talking.
+    """
+    rng = np.random.default_rng(seed)
+    box_w, box_h = 0.12 * width, 0.45 * height
+    start = rng.uniform(0, 1, count)
+    speed = rng.uniform(0.05, 0.15, count)  # scene widths per second
+    phase = (start + speed * t) % 2
+    x = np.where(phase < 1, phase, 2 - phase) * (width - box_w)
+    y = rng.uniform(0.2, 0.5, count) * height
+    return np.stack([x, y, x + box_w, y + box_h], axis=1)
+
+
+class SyntheticCapture:
+    """
+    cv2.VideoCapture stand-in for `synthetic://640x360@25?people=3`: a
+    fixed background with `people` moving boxes, paced to `fps`.
+    """
+
+    def __init__(self, width=640, height=360, fps=25.0, people=3):
+        self.width, self.height, self.fps, self.people = width, height, fps, people
+        x = np.linspace(40, 200, width, dtype=np.uint8)
+        y = np.linspace(60, 160, height, dtype=np.uint8)
+        self.background = np.dstack(np.broadcast_arrays(x[None, :], y[:, None], x[None, :] // 2 + y[:, None] // 2))
+        self.next_time = time.time()
+        self.grab_time = None
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        delay = self.next_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.grab_time = time.time()
+        self.next_time = max(self.next_time + 1.0 / self.fps, self.grab_time)
+        return True
+
+    def retrieve(self):
+        frame = self.background.copy()
+        for x1, y1, x2, y2 in people_at(self.grab_time, self.people, self.width, self.height).astype(int):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (30, 30, 220), -1)
+        return True, frame
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_WIDTH: self.width,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.height}.get(prop, 0.0)
+
+    def release(self):
+        pass
+
+
+class ReplayCapture:
+    """A video file played at its own frame rate like a live camera, starting over at the end."""
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.next_time = time.time()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def grab(self):
+        delay = self.next_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time + 1.0 / self.fps, time.time())
+        if self.cap.grab():
+            return True
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self.cap.grab()
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(source, hw_acceleration=True, open_timeout_ms=None, read_timeout_ms=None):
+    """Replacement for capture.open_capture: synthetic:// scenes and paced, looping video files."""
+    url = urlparse(source)
+    if url.scheme == SYNTHETIC:
+        size, _, fps = url.netloc.partition("@")
+        width, _, height = size.partition("x")
+        people = int(parse_qs(url.query).get("people", ["3"])[0])
+        return SyntheticCapture(int(width or 640), int(height or 360), float(fps or 25), people)
+    return ReplayCapture(source)
@@ -0,0 +1,216 @@
+"""
+One stage of the replay harness; started by bench_pipeline.py.
+
+    python replay/stages.py tracking --redis-port 6390 --cameras REPLAY1 REPLAY2
+
+Each stage imports the real service code from its own directory, with that
+service's config, except that Redis points at --redis-host/--redis-port and
+the pose model is StubPoseModel. Per-camera stages start one process per
+camera, like the services' server scripts. Every process writes its RSS,
+CPU time and stage counters to the `replay:stats` hash once a second.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+from multiprocessing import Process
+
+import sources
+from stub_model import StubPoseModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATS_KEY = "replay:stats"
+EPOCH_KEY = "replay:epoch"  # bumped by the harness when the measured window starts
+
+
+def enter_service(service, args):
+    """Makes `{service}_service` the working directory and import root, with Redis redirected."""
+    directory = os.path.join(ROOT, f"{service}_service")
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    use_default_logger()
+    import config.loader as loader
+
+    loader.REDIS_HOSTNAME = args.redis_host
+    loader.REDIS_PORT = args.redis_port
+    return loader
+
+
+def use_default_logger():
+    """
+    The services log through `logs.log_handler`, which deployments provide
+    next to the code; where it is missing the stages log through the
+    standard logging module instead.
+    """
+    try:
+        import logs.log_handler  # noqa: F401
+    except ImportError:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(processName)s %(message)s")
+        log_handler = types.ModuleType("logs.log_handler")
+        log_handler.logger = logging.getLogger("replay")
+        package = types.ModuleType("logs")
+        package.__path__ = []
+        package.log_handler = log_handler
+        sys.modules.update({"logs": package, "logs.log_handler": log_handler})
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as stream:
+            return int(stream.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # peak, KB on Linux
+
+
+def report(args, name, collect=None, on_epoch=None):
+    """Starts a thread writing this process's stats under `name`; `collect()` adds stage fields."""
+    import redis
+
+    conn = redis.Redis(host=args.redis_host, port=args.redis_port)
+
+    def loop():
+        epoch = conn.get(EPOCH_KEY)
+        while True:
+            current = conn.get(EPOCH_KEY)
+            if current != epoch:
+                epoch = current
+                if on_epoch is not None:
+                    on_epoch()
+            stats = {"pid": os.getpid(), "rss_mb": rss_mb(), "cpu_s": time.process_time()}
+            if collect is not None:
+                stats.update(collect())
+            conn.hset(STATS_KEY, name, json.dumps(stats))
+            time.sleep(1.0)
+
+    threading.Thread(target=loop, daemon=True, name="replay-report").start()
+
+
+def run_processes(target, cam_ids):
+    processes = [Process(target=target, args=(cam_id,)) for cam_id in cam_ids]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def camera(args):
+    loader = enter_service("camera", args)
+    loader.STATS_INTERVAL = 1  # capture_stats:{id} once a second, for bench_capture.py
+    import capture
+
+    capture.open_capture = sources.open_source
+    import server_cam
+    import capture_pool
+
+    camera_sources = dict(zip(args.cameras, args.sources))
+    mode = args.capture_mode or loader.CAPTURE_MODE
+    if mode == capture_pool.THREADS:
+        def init_worker():
+            server_cam.init_worker()
+            report(args, f"camera:worker-{os.getpid()}")
+
+        pool = capture_pool.create(mode, server_cam.add_frames, args.capture_workers or loader.CAPTURE_WORKERS,
+                                   args=(server_cam.cfg,), initializer=init_worker)
+        for cam_id in args.cameras:
+            pool.add({"id": cam_id, "rtsp": camera_sources[cam_id]})
+        pool.join()
+        return
+
+    def run(cam_id):
+        report(args, f"camera:{cam_id}")
+        server_cam.add_frames({"id": cam_id, "rtsp": camera_sources[cam_id]}, server_cam.cfg)
+
+    run_processes(run, args.cameras)
+
+
+def tracking(args):
+    loader = enter_service("tracking", args)
+    import redis
+    from pose_estimate import PoseEstimator
+    from batch_inference import BatchInferenceWorker
+
+    model = StubPoseModel(people=args.people, image_ms=args.image_ms, call_ms=args.call_ms)
+    conn = redis.Redis(host=args.redis_host, port=args.redis_port)
+    if loader.INFERENCE_MODE == "batched":
+        report(args, "tracking")
+        BatchInferenceWorker(args.cameras, model=model).run(conn)
+        return
+
+    def run(cam_id):
+        report(args, f"tracking:{cam_id}")
+        PoseEstimator(cam_id, model=model).run(redis.Redis(host=args.redis_host, port=args.redis_port))
+
+    run_processes(run, args.cameras)
+
+
+def business(args):
+    enter_service("business", args)
+    import redis
+    from fall_detect import Falling
+
+    # velocity history files go here instead of the service directory
+    os.chdir(tempfile.mkdtemp(prefix="replay_business_"))
+
+    def run(cam_id):
+        report(args, f"business:{cam_id}")
+        Falling(cam_id).run(redis.Redis(host=args.redis_host, port=args.redis_port))
+
+    run_processes(run, args.cameras)
+
+
+def visualization(args):
+    loader = enter_service("visualization", args)
+    loader.FALLS_DIR = tempfile.mkdtemp(prefix="replay_falls_")
+    import redis
+    import rendering
+    from broadcaster import BroadcasterRegistry
+
+    conn = redis.Redis(host=args.redis_host, port=args.redis_port)
+    registry = BroadcasterRegistry(conn, rendering.render, policy=loader.READ_POLICY, block_ms=loader.READ_BLOCK_MS,
+                                   latency=rendering.latency)
+    frames = {cam_id: 0 for cam_id in args.cameras}
+
+    def view(cam_id):
+        # one viewer per camera, so every frame is rendered and encoded like for a browser
+        for _ in registry.subscribe(cam_id):
+            frames[cam_id] += 1
+
+    def reset_latency():
+        with rendering.latency.lock:
+            rendering.latency.histograms.clear()
+
+    for cam_id in args.cameras:
+        threading.Thread(target=view, args=(cam_id,), daemon=True, name=f"viewer-{cam_id}").start()
+    report(args, "visualization", lambda: {"frames": dict(frames), "latency": rendering.latency.summary()},
+           on_epoch=reset_latency)
+    while True:
+        time.sleep(3600)
+
+
+STAGES = {"camera": camera, "tracking": tracking, "business": business, "visualization": visualization}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stage", choices=list(STAGES))
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--cameras", nargs="+", required=True)
+    parser.add_argument("--sources", nargs="+", default=[], help="camera stage: one source per camera")
+    parser.add_argument("--capture-mode", default=None, help="camera stage: process or threads, config by default")
+    parser.add_argument("--capture-workers", type=int, default=None, help="camera stage: worker processes (threads)")
+    parser.add_argument("--people", type=int, default=3, help="tracking stage: people the stub model finds")
+    parser.add_argument("--image-ms", type=float, default=10.0, help="tracking stage: stub model cost per image")
+    parser.add_argument("--call-ms", type=float, default=5.0, help="tracking stage: stub model cost per call")
+    args = parser.parse_args()
+    STAGES[args.stage](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""A CPU-only stand-in for the YOLO pose model, for the replay harness."""
+import time
+
+import numpy as np
+
+from sources import people_at
+
+
+class _Array:
+    """The tensor calls pose_estimate.py makes (`.cpu().numpy()`) on a numpy array."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = _Array(data)
+        self.conf = _Array(data[:, 4])
+        self.cls = _Array(data[:, 5])
+
+    def __len__(self):
+        return len(self.data.array)
+
+
+class _Keypoints:
+    def __init__(self, data):
+        self.data = _Array(data)
+
+
+class _Result:
+    def __init__(self, boxes, keypoints):
+        self.boxes = _Boxes(boxes)
+        self.keypoints = _Keypoints(keypoints)
+
+
+# Where the 8 keypoints (shoulders, hips, knees, ankles; left then right) sit inside a standing person's box
+KEYPOINT_LAYOUT = np.array([[0.3, 0.2], [0.7, 0.2], [0.35, 0.5], [0.65, 0.5],
+                            [0.35, 0.75], [0.65, 0.75], [0.35, 0.98], [0.65, 0.98]], dtype=np.float32)
+
+
+class StubPoseModel:
+    """
+    Returns the people sources.people_at places in each image, after
+    sleeping `call_ms` per predict call plus `image_ms` per image to stand
+    in for model cost (batching pays the call overhead once).
+    """
+
+    def __init__(self, people=3, image_ms=10.0, call_ms=5.0):
+        self.people = people
+        self.image_ms = image_ms
+        self.call_ms = call_ms
+
+    def fuse(self):
+        pass
+
+    def predict(self, frames, **kwargs):
+        if not isinstance(frames, (list, tuple)):
+            frames = [frames]
+        time.sleep((self.call_ms + self.image_ms * len(frames)) / 1000.0)
+        now = time.time()
+        return [self.result(frame, now) for frame in frames]
+
+    def result(self, frame, now):
+        height, width = frame.shape[:2]
+        boxes = people_at(now, self.people, width, height).astype(np.float32)
+        size = boxes[:, 2:] - boxes[:, :2]
+        keypoints = np.ones((len(boxes), len(KEYPOINT_LAYOUT), 3), dtype=np.float32)
+        keypoints[..., :2] = boxes[:, None, :2] + KEYPOINT_LAYOUT[None] * size[:, None]
+        data = np.zeros((len(boxes), 6), dtype=np.float32)
+        data[:, :4] = boxes
+        data[:, 4] = 0.9
+        return _Result(data, keypoints)
@@ -0,0 +1,198 @@
+import time
+
+from config.loader import (
+    STREAMMAXLEN,
+    MAX_BATCH_SIZE,
+    MAX_WAIT_MS,
+    MAX_PENDING,
+    READ_POLICY,
+    READ_BLOCK_MS,
+    READ_GROUP,
+    LATENCY_LOG_INTERVAL,
+)
+from logs.log_handler import logger
+from pose_estimate import PoseEstimator, load_model, start_publisher
+from stream_reader import StreamReader, LATEST_ONLY
+from latency import LatencyRecorder, stamp
+from camera_updates import ADD, REMOVE
+
+
+class BatchInferenceWorker:
+    """
+    Runs one shared pose model for many cameras.
+
+    New frames of every `cam:{id}` stream are read with one blocking XREAD and
+    collected until either `max_batch_size` cameras have a frame pending or
+    `max_wait_ms` has passed since the first one arrived. Then a single batched
+    `predict` is run and each result is published to the matching
+    `tracked_cam:{id}` stream.
+
+    Cameras can be added and removed while it runs (see `run`); they share
+    the already loaded model, so a new camera starts without a cold start.
+    """
+
+    def __init__(self, cam_ids, model=None, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 max_pending=MAX_PENDING):
+        self.model = model if model is not None else load_model()
+        self.latency = LatencyRecorder("tracking", LATENCY_LOG_INTERVAL)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max(1, int(max_pending))
+        self.estimators = {}
+        self.keys = {}  # stream key -> cam_id
+        self.pending = {}  # cam_id -> (fields, received_at) read but not yet inferred
+        self.reader = None
+        self.publisher = None
+        self.count = 0
+        for cam_id in cam_ids:
+            self.add_camera(cam_id)
+
+    def add_camera(self, cam_id):
+        if cam_id in self.estimators:
+            return
+        estimator = PoseEstimator(cam_id, model=self.model, latency=self.latency)
+        self.estimators[cam_id] = estimator
+        self.keys[estimator.redis_key] = cam_id
+        if self.reader is not None:
+            self.reader.add_key(estimator.redis_key)
+
+    def remove_camera(self, cam_id):
+        estimator = self.estimators.pop(cam_id, None)
+        if estimator is None:
+            return
+        self.keys.pop(estimator.redis_key, None)
+        self.pending.pop(cam_id, None)
+        if self.reader is not None:
+            self.reader.remove_key(estimator.redis_key)
+            # Results still queued for it would create the stream again after the delete
+            if self.publisher is not None:
+                self.publisher.discard(estimator.tracked_key)
+            # Nothing reads the results of a removed camera anymore
+            self.reader.conn.delete(estimator.tracked_key, f"load_control:{cam_id}")
+
+    def apply(self, updates):
+        """Applies CameraUpdates.pending() results; an update of a known camera keeps its state."""
+        for action, camera_info in updates:
+            if action == ADD:
+                if camera_info["id"] not in self.estimators:
+                    logger.info(f"Tracking camera {camera_info['id']}")
+                self.add_camera(camera_info["id"])
+            elif action == REMOVE and camera_info["id"] in self.estimators:
+                logger.info(f"Stopped tracking camera {camera_info['id']}")
+                self.remove_camera(camera_info["id"])
+
+    def receive(self, entries_by_key):
+        received_at = time.time()
+        for key, entries in entries_by_key.items():
+            cam_id = self.keys.get(key)
+            if cam_id is None:
+                continue
+            # Frames over the camera's current max_fps are shed before they take a batch slot
+            entries = [entry for entry in entries if self.estimators[cam_id].control.admit(received_at)]
+            if not entries:
+                continue
+            queue = self.pending.setdefault(cam_id, [])
+            if self.reader.policy == LATEST_ONLY and queue:
+                # A newer frame arrived before the camera got a batch slot
+                self.reader.dropped[key] += len(queue)
+                queue.clear()
+            queue.extend((data, received_at) for _, data in entries)
+            if len(queue) > self.max_pending:
+                # The model is slower than the camera: keep the newest frames only
+                self.reader.dropped[key] += len(queue) - self.max_pending
+                del queue[:-self.max_pending]
+
+    def collect(self):
+        deadline = None
+        while True:
+            ready = [cam_id for cam_id, queue in self.pending.items() if queue]
+            if len(ready) >= self.max_batch_size:
+                break
+            if ready:
+                now = time.time()
+                if deadline is None:
+                    deadline = now + self.max_wait
+                if now >= deadline:
+                    break
+                block_ms = max(1, int((deadline - now) * 1000))
+            else:
+                block_ms = self.reader.block_ms
+            entries_by_key = self.reader.read(block_ms)
+            if not entries_by_key and not ready:
+                return {}
+            self.receive(entries_by_key)
+
+        batch = {}
+        for cam_id in ready[:self.max_batch_size]:
+            batch[cam_id] = self.pending[cam_id].pop(0)
+            # Move served cameras to the back so no camera is starved
+            self.pending[cam_id] = self.pending.pop(cam_id)
+        return batch
+
+    def infer(self, batch):
+        """batch: {cam_id: (redis stream fields, received_at)}. Returns {cam_id: result fields}."""
+        cam_ids, frames, infos, tiles = [], [], [], []
+        outputs = {}
+        for cam_id, (data, received_at) in batch.items():
+            estimator = self.estimators[cam_id]
+            frame, frame_info = estimator.decode(data, received_at)
+            if frame is None:
+                continue
+            if not estimator.gate.check(frame):
+                # Static, empty scene: published without taking a place in the predict call
+                pose_result, smoothed_fps = estimator.static_result(frame_info)
+                outputs[cam_id] = estimator.build_result(data, frame_info, pose_result, smoothed_fps)
+                continue
+            cam_ids.append(cam_id)
+            frames.append(frame)
+            infos.append(frame_info)
+            tiles.append(estimator.tiles(data, frame, frame_info))
+        if not frames:
+            return outputs
+
+        # Cameras shed to a smaller input size are predicted together, one call per size;
+        # a camera with ROIs adds all of its tiles to the call
+        groups = {}
+        for i, cam_id in enumerate(cam_ids):
+            groups.setdefault(self.estimators[cam_id].control.imgsz, []).append(i)
+        results = [None] * len(frames)
+        current_time = time.time()
+        for indices in groups.values():
+            images = [tile.image for i in indices for tile in tiles[i]]
+            predicted = iter(self.estimators[cam_ids[indices[0]]].predict(images))
+            for i in indices:
+                results[i] = [next(predicted) for _ in tiles[i]]
+        # Every camera in the batch waited for the whole call
+        inferred_at = time.time()
+        frame_duration = inferred_at - current_time
+
+        for cam_id, frame, frame_info, frame_tiles, frame_results in zip(cam_ids, frames, infos, tiles, results):
+            estimator = self.estimators[cam_id]
+            stamp(frame_info, "tracking.inferred", inferred_at)
+            detections = estimator.merge_results(frame_tiles, frame_results)
+            pose_result, smoothed_fps = estimator.postprocess(frame, detections, frame_duration)
+            outputs[cam_id] = estimator.build_result(batch[cam_id][0], frame_info, pose_result, smoothed_fps)
+        return outputs
+
+    def run(self, conn, updates=None):
+        """`updates`: an optional CameraUpdates, applied between batches (within READ_BLOCK_MS)."""
+        self.reader = StreamReader(conn, list(self.keys), policy=READ_POLICY, block_ms=READ_BLOCK_MS,
+                                   group=READ_GROUP, consumer="tracking:batched")
+        # Results of all cameras share pipelined writes instead of a round trip per batch
+        self.publisher = start_publisher(conn, "tracking:batched")
+        while True:
+            if updates is not None:
+                self.apply(updates.pending())
+            batch = self.collect()
+            if not batch:
+                continue
+            try:
+                outputs = self.infer(batch)
+            except Exception as e:
+                logger.error(f"Batch inference failed for {list(batch)}: {e}")
+                continue
+            self.count += 1
+            for cam_id, result in outputs.items():
+                self.publisher.publish(self.estimators[cam_id].tracked_key, result, maxlen=STREAMMAXLEN)
+            for cam_id in outputs:
+                self.estimators[cam_id].control.publish(conn)
@@ -0,0 +1,71 @@
+"""
+CPU throughput benchmark: one predict call per camera vs one batched call.
+
+    python bench_batch_inference.py --cameras 1 4 16 --rounds 20
+
+Frames are synthetic, so the numbers measure model cost only (no Redis,
+no JPEG decode). Run it from the tracking_service directory.
+"""
+import argparse
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+from config.loader import MODEL, CONF_THRESHOLD, IOU_THRESHOLD, MAX_BATCH_SIZE
+
+
+def make_frames(n, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def predict(model, frames, imgsz):
+    return model.predict(frames, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD,
+                         imgsz=imgsz, device="cpu", verbose=False)
+
+
+def bench_per_camera(model, frames, rounds, imgsz):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            predict(model, frame, imgsz)
+    return time.perf_counter() - start
+
+
+def bench_batched(model, frames, rounds, imgsz, max_batch_size):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(0, len(frames), max_batch_size):
+            predict(model, frames[i:i + max_batch_size], imgsz)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    model = YOLO(args.model)
+    model.fuse()
+    # warm-up so lazy initialisation is not billed to the first run
+    predict(model, make_frames(1, args.width, args.height), args.imgsz)
+
+    print(f"{'cameras':>8} {'mode':>11} {'frames/s':>10} {'ms/round':>10} {'speedup':>8}")
+    for n in args.cameras:
+        frames = make_frames(n, args.width, args.height, seed=n)
+        single = bench_per_camera(model, frames, args.rounds, args.imgsz)
+        batched = bench_batched(model, frames, args.rounds, args.imgsz, args.max_batch_size)
+        total = n * args.rounds
+        print(f"{n:>8} {'per_camera':>11} {total / single:>10.1f} {1000 * single / args.rounds:>10.1f} {'':>8}")
+        print(f"{n:>8} {'batched':>11} {total / batched:>10.1f} {1000 * batched / args.rounds:>10.1f} {single / batched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-frame cost of each identity mode (none / bytetrack / reid).
+
+    python bench_identity.py --people 1 10 30 --frames 200
+
+People walk across a synthetic frame so trackers see realistic motion; the
+model is not involved, only the identity stage is timed.
+"""
+import argparse
+
+import numpy as np
+
+from config.loader import TRACKER_CFG, REID_THRESHOLD, REID_CAPACITY, REID_MAX_AGE, REID_WORKERS
+from identity import Detections, build_identity
+
+MODES = ["none", "bytetrack", "reid"]
+
+
+def make_scenes(people, frames, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    start = rng.uniform([0, 0], [width - 80, height - 200], (people, 2))
+    speed = rng.uniform(-3, 3, (people, 2))
+    scenes = []
+    for t in range(frames):
+        top_left = np.clip(start + speed * t, 0, [width - 80, height - 200])
+        xyxy = np.hstack([top_left, top_left + [80, 200]])
+        scenes.append(Detections(xyxy, np.full(people, 0.9), np.zeros(people)))
+    return scenes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 10, 30])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    reid_kwargs = dict(threshold=REID_THRESHOLD, capacity=REID_CAPACITY,
+                       max_age=REID_MAX_AGE, workers=REID_WORKERS)
+
+    print(f"{'people':>7} " + " ".join(f"{mode + ' ms':>13}" for mode in MODES))
+    for people in args.people:
+        scenes = make_scenes(people, args.frames, args.width, args.height)
+        costs = []
+        for mode in MODES:
+            stage = build_identity(mode, tracker_cfg=TRACKER_CFG, reid_kwargs=reid_kwargs)
+            for detections in scenes:
+                stage.assign(frame, detections)
+            costs.append(stage.cost_ms)
+        print(f"{people:>7} " + " ".join(f"{cost:>13.3f}" for cost in costs))
+
+
+if __name__ == "__main__":
+    main()
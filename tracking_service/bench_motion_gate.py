@@ -0,0 +1,91 @@
+"""
+Model time saved by the motion gate on recorded footage.
+
+    python bench_motion_gate.py --video corridor.mp4 entrance.mp4 --imgsz 640
+
+Each video is played at its own frame rate (timestamps come from the frame
+index, so the heartbeat behaves as it would live) and the model runs on
+every frame once. Its time on all frames is the ungated cost; its time on
+the frames the gate lets through, plus the gate itself, is the gated cost.
+"missed" counts skipped frames where the model did find people, i.e.
+detections the gate would have lost. Run it from the tracking_service
+directory.
+"""
+import argparse
+import time
+
+import cv2
+from ultralytics import YOLO
+
+from config.loader import MODEL, CONF_THRESHOLD, IOU_THRESHOLD
+from config.loader import MOTION_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_CHANGED, MOTION_BACKGROUND_ALPHA
+from config.loader import MOTION_HEARTBEAT
+from motion_gate import MotionGate
+
+
+def predict(model, frame, imgsz, device):
+    return model.predict(frame, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, imgsz=imgsz, device=device, verbose=False)
+
+
+def replay(model, path, args):
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    gate = MotionGate(width=args.width, pixel_threshold=args.pixel_threshold, min_changed=args.min_changed,
+                      background_alpha=args.background_alpha, heartbeat=args.heartbeat)
+    frames = missed = 0
+    model_all = model_gated = gate_time = 0.0
+    while frames < args.max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        start = time.perf_counter()
+        infer = gate.check(frame, now=frames / fps)
+        gate_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = predict(model, frame, args.imgsz, args.device)
+        elapsed = time.perf_counter() - start
+        people = len(results[0].boxes) if results and results[0].boxes is not None else 0
+
+        model_all += elapsed
+        if infer:
+            model_gated += elapsed
+            gate.record(people)
+        elif people:
+            missed += 1
+        frames += 1
+    capture.release()
+    return frames, gate.inferred, missed, model_all, model_gated, gate_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video", nargs="+", required=True)
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--max-frames", type=int, default=3000)
+    parser.add_argument("--width", type=int, default=MOTION_WIDTH)
+    parser.add_argument("--pixel-threshold", type=int, default=MOTION_PIXEL_THRESHOLD)
+    parser.add_argument("--min-changed", type=float, default=MOTION_MIN_CHANGED)
+    parser.add_argument("--background-alpha", type=float, default=MOTION_BACKGROUND_ALPHA)
+    parser.add_argument("--heartbeat", type=float, default=MOTION_HEARTBEAT)
+    args = parser.parse_args()
+
+    model = YOLO(args.model)
+    model.fuse()
+
+    print(f"{'video':>24} {'frames':>7} {'inferred':>9} {'missed':>7} {'model s':>8} {'gated s':>8} "
+          f"{'gate ms/f':>10} {'saved':>7}")
+    for path in args.video:
+        frames, inferred, missed, model_all, model_gated, gate_time = replay(model, path, args)
+        if not frames:
+            print(f"{path[-24:]:>24} no frames")
+            continue
+        gated = model_gated + gate_time
+        print(f"{path[-24:]:>24} {frames:>7} {100 * inferred / frames:>8.1f}% {missed:>7} {model_all:>8.2f} "
+              f"{gated:>8.2f} {1e3 * gate_time / frames:>10.3f} {100 * (1 - gated / model_all):>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+ReID matching latency against gallery size.
+
+    python bench_reid.py --sizes 100 10000 100000 --detections 10
+
+Compares the vectorized gallery (one matrix product + Hungarian assignment
+per frame) with the previous approach of scoring every gallery entry in a
+Python loop, one detection at a time. The loop is skipped above
+--loop-max-size because it gets too slow to be useful.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from reID import ReIDManager
+
+
+def random_embeddings(rng, n, dim):
+    emb = rng.random((n, dim), dtype=np.float32) ** 4  # sparse-ish, like colour histograms
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def fill_gallery(size, dim, rng):
+    reid = ReIDManager(threshold=0.8, capacity=size, max_age=1e9, dim=dim)
+    reid.embeddings[:] = random_embeddings(rng, size, dim)
+    reid.ids[:] = np.arange(1, size + 1)
+    reid.counts[:] = 1
+    reid.last_seen[:] = 0.0
+    reid.active[:] = True
+    reid.free = []
+    reid.global_id_counter = size
+    return reid
+
+
+def loop_match(gallery, embedding, threshold):
+    best_id, best_score = None, -1
+    for global_id, stored in gallery.items():
+        score = float(embedding @ stored) / (np.linalg.norm(embedding) * np.linalg.norm(stored))
+        if score > best_score:
+            best_score, best_id = score, global_id
+    return best_id if best_score >= threshold else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--detections", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--loop-max-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>8} {'vectorized ms/frame':>20} {'loop ms/frame':>14}")
+    for size in args.sizes:
+        reid = fill_gallery(size, args.dim, rng)
+        frames = []
+        for _ in range(args.frames):
+            # half of the detections are noisy copies of known people
+            known = reid.embeddings[rng.integers(0, size, args.detections // 2)]
+            known = known + 0.01 * rng.random(known.shape, dtype=np.float32)
+            frames.append(np.vstack([known, random_embeddings(rng, args.detections - len(known), args.dim)]))
+
+        start = time.perf_counter()
+        for i, embeddings in enumerate(frames):
+            reid.match_or_create_global_ids(embeddings, now=float(i))
+        vectorized = 1000 * (time.perf_counter() - start) / args.frames
+
+        loop = "skipped"
+        if size <= args.loop_max_size:
+            gallery = {int(reid.ids[row]): reid.embeddings[row].copy() for row in range(size)}
+            start = time.perf_counter()
+            for embeddings in frames:
+                for embedding in embeddings:
+                    loop_match(gallery, embedding, reid.threshold)
+            loop = f"{1000 * (time.perf_counter() - start) / args.frames:.2f}"
+
+        print(f"{size:>8} {vectorized:>20.2f} {loop:>14}")
+
+
+if __name__ == "__main__":
+    main()
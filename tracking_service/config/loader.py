@@ -26,7 +26,51 @@ cfg = load_config()
 REDIS_HOSTNAME = cfg["redis"]["HOSTNAME"]
 REDIS_PORT = cfg["redis"]["PORT"]
 STREAMMAXLEN = cfg["stream"]["STREAMMAXLEN"]
+FRAME_CODEC = cfg["stream"]["frame_codec"]
+READ_POLICY = cfg["stream"]["read_policy"]
+READ_BLOCK_MS = cfg["stream"]["block_ms"]
+READ_GROUP = cfg["stream"]["consumer_group"]
 MODEL = cfg["model"]
 CAMERAS = cfg["cameras"]
 
- 
\ No newline at end of file
+INFERENCE_MODE = cfg["inference"]["mode"]
+MAX_BATCH_SIZE = cfg["inference"]["max_batch_size"]
+MAX_WAIT_MS = cfg["inference"]["max_wait_ms"]
+MAX_PENDING = cfg["inference"]["max_pending"]
+CONF_THRESHOLD = cfg["inference"]["conf"]
+IOU_THRESHOLD = cfg["inference"]["iou"]
+
+IDENTITY_MODE = cfg["identity"]["mode"]
+TRACKER_CFG = cfg["identity"]["tracker"]
+
+REID_THRESHOLD = cfg["reid"]["threshold"]
+REID_CAPACITY = cfg["reid"]["capacity"]
+REID_MAX_AGE = cfg["reid"]["max_age"]
+REID_WORKERS = cfg["reid"]["workers"]
+
+LATENCY_LOG_INTERVAL = cfg["latency"]["log_interval"]
+
+PUBLISH_MAX_BATCH = cfg["publisher"]["max_batch"]
+PUBLISH_FLUSH_MS = cfg["publisher"]["flush_ms"]
+PUBLISH_MAX_QUEUE = cfg["publisher"]["max_queue"]
+PUBLISH_STATS_INTERVAL = cfg["publisher"]["stats_interval"]
+
+TILING_ENABLED = cfg["tiling"]["enabled"]
+TILE_SIZE = cfg["tiling"]["tile_size"]
+TILE_OVERLAP = cfg["tiling"]["overlap"]
+MAX_TILES = cfg["tiling"]["max_tiles"]
+TILE_MERGE_THRESHOLD = cfg["tiling"]["merge_threshold"]
+
+MOTION_GATE_ENABLED = cfg["motion_gate"]["enabled"]
+MOTION_WIDTH = cfg["motion_gate"]["width"]
+MOTION_PIXEL_THRESHOLD = cfg["motion_gate"]["pixel_threshold"]
+MOTION_MIN_CHANGED = cfg["motion_gate"]["min_changed"]
+MOTION_BACKGROUND_ALPHA = cfg["motion_gate"]["background_alpha"]
+MOTION_HEARTBEAT = cfg["motion_gate"]["heartbeat"]
+
+LOAD_CONTROL_ENABLED = cfg["load_control"]["enabled"]
+LOAD_BUDGET_MS = cfg["load_control"]["budget_ms"]
+LOAD_WINDOW = cfg["load_control"]["window"]
+LOAD_HEADROOM = cfg["load_control"]["headroom"]
+LOAD_RECOVER_WINDOWS = cfg["load_control"]["recover_windows"]
+LOAD_STEPS = cfg["load_control"]["steps"]
@@ -0,0 +1,143 @@
+import os
+from multiprocessing import shared_memory, resource_tracker
+
+import cv2
+import numpy as np
+
+RING_HEADER = np.dtype([("token", "<u8"), ("slots", "<u4"), ("max_height", "<u4"),
+                        ("max_width", "<u4"), ("channels", "<u4")])
+SLOT_HEADER = np.dtype([("seq", "<u8"), ("height", "<u4"), ("width", "<u4")])
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track`; stop the resource tracker from
+        # unlinking a segment this process does not own when it exits.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedFrameRing:
+    """
+    Fixed-size ring of raw BGR frames in POSIX shared memory, one per camera.
+
+    The camera process owns the segment and writes frames in place; Redis
+    then only carries a small reference (see `ref`). Each slot has a sequence
+    number that is odd while the slot is being written, so a reader can tell
+    when a slot was overwritten while it was copying it.
+    """
+
+    def __init__(self, cam_id, slots=8, max_height=720, max_width=1280, channels=3, create=False):
+        self.name = f"frames_{cam_id}"
+        if create:
+            self.slot_bytes = max_height * max_width * channels
+            size = RING_HEADER.itemsize + slots * (SLOT_HEADER.itemsize + self.slot_bytes)
+            try:
+                stale = _attach(self.name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            self.header = np.ndarray((1,), dtype=RING_HEADER, buffer=self.shm.buf)[0]
+            self.header["token"] = int.from_bytes(os.urandom(8), "little") >> 1
+            self.header["slots"] = slots
+            self.header["max_height"] = max_height
+            self.header["max_width"] = max_width
+            self.header["channels"] = channels
+        else:
+            self.shm = _attach(self.name)
+            self.header = np.ndarray((1,), dtype=RING_HEADER, buffer=self.shm.buf)[0]
+
+        self.token = int(self.header["token"])
+        self.slots = int(self.header["slots"])
+        self.max_height = int(self.header["max_height"])
+        self.max_width = int(self.header["max_width"])
+        self.channels = int(self.header["channels"])
+        self.slot_bytes = self.max_height * self.max_width * self.channels
+        offset = RING_HEADER.itemsize
+        self.slot_headers = np.ndarray((self.slots,), dtype=SLOT_HEADER, buffer=self.shm.buf, offset=offset)
+        offset += self.slots * SLOT_HEADER.itemsize
+        self.data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+        self.next_slot = 0
+        self.seq = 0
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if height > self.max_height or width > self.max_width:
+            raise ValueError(f"Frame {width}x{height} does not fit ring {self.max_width}x{self.max_height}")
+
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        self.seq += 2
+        header = self.slot_headers[slot]
+        header["seq"] = self.seq - 1  # odd: write in progress
+        header["height"] = height
+        header["width"] = width
+        np.copyto(self.data[slot, :height * width * self.channels].reshape(height, width, self.channels), frame)
+        header["seq"] = self.seq
+        return self.ref(slot)
+
+    def ref(self, slot):
+        header = self.slot_headers[slot]
+        return {"shm": self.name, "token": self.token, "slot": slot, "seq": int(header["seq"])}
+
+    def read(self, slot, seq):
+        header = self.slot_headers[slot]
+        if int(header["seq"]) != seq:
+            return None
+        height, width = int(header["height"]), int(header["width"])
+        frame = self.data[slot, :height * width * self.channels].reshape(height, width, self.channels).copy()
+        if int(header["seq"]) != seq:
+            return None  # overwritten while copying
+        return frame
+
+    def close(self, unlink=False):
+        self.slot_headers = self.data = self.header = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class FrameResolver:
+    """Reader side: turns `frame_ref`s back into frames, attaching rings on demand."""
+
+    def __init__(self):
+        self.rings = {}
+        self.missed = 0
+
+    def resolve(self, frame_ref):
+        name = frame_ref["shm"]
+        ring = self.rings.get(name)
+        if ring is None or ring.token != frame_ref["token"]:
+            if ring is not None:
+                ring.close()
+                del self.rings[name]
+            try:
+                ring = SharedFrameRing(name[len("frames_"):])
+            except FileNotFoundError:
+                self.missed += 1
+                return None
+            if ring.token != frame_ref["token"]:
+                ring.close()
+                self.missed += 1
+                return None
+            self.rings[name] = ring
+        frame = ring.read(frame_ref["slot"], frame_ref["seq"])
+        if frame is None:
+            self.missed += 1
+        return frame
+
+
+def load_frame(data, frame_info, resolver):
+    """Returns the BGR frame of a stream entry, whichever transport carried it."""
+    frame_bytes = data.get(b"frame")
+    if frame_bytes:
+        return cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+    frame_ref = frame_info.get("frame_ref")
+    if frame_ref is None:
+        return None
+    return resolver.resolve(frame_ref)
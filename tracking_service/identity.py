@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import yaml
+
+from reID import ReIDManager
+
+
+class Detections:
+    """The numpy-backed view of one frame's boxes that the ultralytics trackers expect."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.float32).reshape(-1)
+
+    @property
+    def xywh(self):
+        xywh = self.xyxy.copy()
+        xywh[:, 2:] -= xywh[:, :2]
+        xywh[:, :2] += xywh[:, 2:] / 2
+        return xywh
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index])
+
+
+class IdentityStage:
+    """
+    Assigns an identity to every detection of a frame.
+
+    `assign` returns one ID per detection, or None for detections that should
+    not be emitted. The average cost of `assign` is kept in `cost_ms`.
+    """
+
+    mode = None
+
+    def __init__(self):
+        self.cost_ms = 0.0
+        self.calls = 0
+
+    def assign(self, frame, detections):
+        start = time.perf_counter()
+        ids = self._assign(frame, detections)
+        elapsed = 1000 * (time.perf_counter() - start)
+        self.calls += 1
+        # running mean for the first frames, then an EMA that follows load changes
+        alpha = max(1.0 / self.calls, 0.05)
+        self.cost_ms += alpha * (elapsed - self.cost_ms)
+        return ids
+
+    def _assign(self, frame, detections):
+        raise NotImplementedError
+
+
+class NoIdentity(IdentityStage):
+    """Per-frame detection index; cheap but not stable across frames."""
+
+    mode = "none"
+
+    def _assign(self, frame, detections):
+        return list(range(len(detections)))
+
+
+class ByteTrackIdentity(IdentityStage):
+    """ByteTrack from ultralytics, configured by the same YAML `model.track` uses."""
+
+    mode = "bytetrack"
+
+    def __init__(self, tracker_cfg):
+        super().__init__()
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils import ROOT, IterableSimpleNamespace
+
+        # Defaults first so keys missing from the custom file still exist
+        with open(ROOT / "cfg" / "trackers" / "bytetrack.yaml") as stream:
+            args = yaml.safe_load(stream)
+        with open(tracker_cfg) as stream:
+            args.update(yaml.safe_load(stream))
+        self.tracker = BYTETracker(args=IterableSimpleNamespace(**args))
+
+    def _assign(self, frame, detections):
+        ids = [None] * len(detections)
+        # Called on empty frames too, so lost tracks still age out
+        tracks = self.tracker.update(detections, frame)
+        for track in tracks:
+            ids[int(track[-1])] = int(track[4])  # [x1, y1, x2, y2, track_id, score, cls, idx]
+        return ids
+
+
+class ReIDIdentity(IdentityStage):
+    """Appearance (HSV histogram) re-identification against a gallery."""
+
+    mode = "reid"
+
+    def __init__(self, reid):
+        super().__init__()
+        self.reid = reid
+
+    def _assign(self, frame, detections):
+        embeddings = self.reid.extract_embeddings(frame, detections.xyxy)
+        return self.reid.match_or_create_global_ids(embeddings)
+
+
+def build_identity(mode, tracker_cfg=None, reid_kwargs=None):
+    if mode == "none":
+        return NoIdentity()
+    if mode == "bytetrack":
+        return ByteTrackIdentity(tracker_cfg)
+    if mode == "reid":
+        return ReIDIdentity(ReIDManager(**(reid_kwargs or {})))
+    raise ValueError(f"Unknown identity mode: {mode}")
@@ -0,0 +1,114 @@
+import time
+import threading
+
+import numpy as np
+
+from logs.log_handler import logger
+
+TRACE = "trace"
+
+# Histogram upper bounds in seconds: 0.5 ms to ~50 s, each 25% above the previous
+BUCKETS = 0.0005 * 1.25 ** np.arange(52)
+
+
+def stamp(frame_info, stage, t=None):
+    """Records when `stage` (e.g. "tracking.inferred") handled the frame; stages keep their order."""
+    frame_info.setdefault(TRACE, {})[stage] = time.time() if t is None else t
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = np.zeros(len(bounds) + 1, dtype=np.int64)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[np.searchsorted(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket, like Prometheus' histogram_quantile."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, rank))
+        if i >= len(self.bounds):
+            return float(self.bounds[-1])
+        lower = self.bounds[i - 1] if i else 0.0
+        below = cumulative[i - 1] if i else 0
+        return float(lower + (self.bounds[i] - lower) * (rank - below) / self.counts[i])
+
+
+class LatencyRecorder:
+    """
+    Per-camera, per-stage latency histograms built from frame traces.
+
+    A trace holds the time every stage saw the frame, in pipeline order
+    (camera.grabbed, camera.published, tracking.received, ...). Each stage
+    is charged the time since the previous one, so `tracking.received`
+    covers the Redis hop and queueing, and `total` spans the first stamp to
+    the last one this service added.
+    """
+
+    def __init__(self, service, log_interval=60.0):
+        self.service = service
+        self.log_interval = log_interval
+        self.histograms = {}  # (cam_id, stage) -> Histogram
+        self.lock = threading.Lock()
+        self.last_log = time.time()
+
+    def observe(self, cam_id, frame_info):
+        stamps = list(frame_info.get(TRACE, {}).items())
+        if len(stamps) < 2:
+            return
+        spans = [(stage, t - prev) for (_, prev), (stage, t) in zip(stamps, stamps[1:])]
+        spans.append(("total", stamps[-1][1] - stamps[0][1]))
+        with self.lock:
+            for stage, seconds in spans:
+                histogram = self.histograms.get((cam_id, stage))
+                if histogram is None:
+                    histogram = self.histograms[(cam_id, stage)] = Histogram()
+                histogram.observe(max(seconds, 0.0))
+        self.maybe_log()
+
+    def summary(self):
+        """{cam_id: {stage: {"p50", "p95", "p99" in ms, "count"}}}"""
+        with self.lock:
+            items = list(self.histograms.items())
+        summary = {}
+        for (cam_id, stage), histogram in items:
+            summary.setdefault(cam_id, {})[stage] = {
+                "p50": 1e3 * histogram.quantile(0.50),
+                "p95": 1e3 * histogram.quantile(0.95),
+                "p99": 1e3 * histogram.quantile(0.99),
+                "count": histogram.count,
+            }
+        return summary
+
+    def maybe_log(self):
+        if not self.log_interval or time.time() - self.last_log < self.log_interval:
+            return
+        self.last_log = time.time()
+        for cam_id, stages in self.summary().items():
+            spans = ", ".join(f"{stage} {s['p50']:.1f}/{s['p95']:.1f}/{s['p99']:.1f}" for stage, s in stages.items())
+            logger.info(f"{self.service} latency {cam_id} p50/p95/p99 ms: {spans}")
+
+    def prometheus(self):
+        """Prometheus text exposition of all histograms."""
+        name = "fall_pipeline_stage_latency_seconds"
+        lines = [f"# HELP {name} Time from the previous pipeline stage to this one, per camera.",
+                 f"# TYPE {name} histogram"]
+        with self.lock:
+            items = sorted(self.histograms.items())
+            for (cam_id, stage), histogram in items:
+                labels = f'camera="{cam_id}",stage="{stage}"'
+                cumulative = np.cumsum(histogram.counts)
+                for bound, count in zip(histogram.bounds, cumulative):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound:.6g}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative[-1]}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import json
+import time
+
+import numpy as np
+
+from logs.log_handler import logger
+from latency import TRACE
+
+EVENTS_KEY = "load_control:events"
+
+
+class LoadController:
+    """
+    Per-camera load shedding against a latency budget.
+
+    `steps` is a ladder of settings, from full quality (step 0) to the
+    cheapest one; each step sets `max_fps` (inference rate, None = every
+    frame), `imgsz` (model input size, None = model default) and
+    `reid_crop` (crop size used for ReID embeddings). The latency of every
+    published frame, from the first stamp of its trace (camera.grabbed) to
+    tracking.published, is collected over `window` seconds. When the window
+    p95 is over `budget_ms` the camera moves one step down the ladder; once
+    it has stayed under `headroom * budget_ms` for `recover_windows` windows
+    in a row it moves one step back up.
+
+    Every change is logged and kept in `events` until `publish` appends it
+    to the `load_control:events` stream; the camera's current step, window
+    p95 and shed count are kept in the `load_control:{cam_id}` hash.
+    """
+
+    def __init__(self, cam_id, steps, budget_ms, window=5.0, headroom=0.6, recover_windows=3, enabled=True):
+        self.cam_id = cam_id
+        self.steps = steps or [{}]
+        self.budget = budget_ms / 1000.0
+        self.window = window
+        self.headroom = headroom
+        self.recover_windows = recover_windows
+        self.enabled = enabled
+        self.level = 0
+        self.samples = []
+        self.window_start = time.time()
+        self.calm_windows = 0
+        self.last_admit = 0.0
+        self.shed = 0  # frames not inferred because of max_fps
+        self.last_p95 = None
+        self.events = []
+        self.dirty = False  # a window closed since the last publish
+
+    @property
+    def step(self):
+        return self.steps[self.level]
+
+    @property
+    def imgsz(self):
+        return self.step.get("imgsz")
+
+    @property
+    def reid_crop(self):
+        return self.step.get("reid_crop")
+
+    def admit(self, now=None):
+        """False if the frame should be skipped to keep the camera under the step's max_fps."""
+        max_fps = self.step.get("max_fps")
+        now = time.time() if now is None else now
+        if max_fps and now - self.last_admit < 1.0 / max_fps:
+            self.shed += 1
+            return False
+        self.last_admit = now
+        return True
+
+    def observe(self, frame_info, now=None):
+        """Feeds one published frame; returns True when the step changed."""
+        if not self.enabled:
+            return False
+        stamps = list(frame_info.get(TRACE, {}).values())
+        if len(stamps) >= 2:
+            self.samples.append(stamps[-1] - stamps[0])
+        now = time.time() if now is None else now
+        if now - self.window_start < self.window:
+            return False
+        self.window_start = now
+        if not self.samples:
+            return False
+        p95 = float(np.percentile(self.samples, 95))
+        self.samples = []
+        self.last_p95 = p95
+        self.dirty = True
+
+        if p95 > self.budget:
+            self.calm_windows = 0
+            if self.level + 1 < len(self.steps):
+                self.change(self.level + 1, p95, now)
+                return True
+        elif p95 < self.headroom * self.budget and self.level > 0:
+            self.calm_windows += 1
+            if self.calm_windows >= self.recover_windows:
+                self.calm_windows = 0
+                self.change(self.level - 1, p95, now)
+                return True
+        else:
+            self.calm_windows = 0
+        return False
+
+    def change(self, level, p95, now):
+        direction = "degraded" if level > self.level else "restored"
+        self.level = level
+        event = {"camera": self.cam_id, "time": now, "action": direction, "step": level,
+                 "settings": self.step, "p95_ms": round(1e3 * p95, 1), "budget_ms": round(1e3 * self.budget, 1)}
+        self.events.append(event)
+        log = logger.warning if direction == "degraded" else logger.info
+        log(f"Load control {direction} cam {self.cam_id} to step {level} {self.step}: "
+            f"p95 {event['p95_ms']} ms, budget {event['budget_ms']} ms")
+
+    def state(self):
+        return {"step": self.level, "settings": self.step, "shed": self.shed,
+                "p95_ms": None if self.last_p95 is None else round(1e3 * self.last_p95, 1),
+                "budget_ms": round(1e3 * self.budget, 1)}
+
+    def publish(self, conn, maxlen=1000):
+        """Writes pending step changes and, once per window, the current state to Redis."""
+        if not self.dirty:
+            return
+        p = conn.pipeline()
+        for event in self.events:
+            p.xadd(EVENTS_KEY, {"event": json.dumps(event)}, maxlen=maxlen, approximate=True)
+        p.hset(f"load_control:{self.cam_id}", mapping={key: json.dumps(value) for key, value in self.state().items()})
+        p.execute()
+        self.events = []
+        self.dirty = False
@@ -0,0 +1,66 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides, per camera, whether a frame needs the pose model.
+
+    Frames are compared at `width` pixels wide, in blurred grayscale,
+    against a running-average background. A frame has motion when more than
+    `min_changed` of its pixels differ from the background by over
+    `pixel_threshold` gray levels. The model runs on frames with motion,
+    while anyone from the previous result is still in view, and at least
+    every `heartbeat` seconds so a motionless person is still picked up.
+    Any other frame is a static, empty scene and reuses the empty result.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed=0.002, background_alpha=0.05, heartbeat=2.0,
+                 enabled=True):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.background_alpha = background_alpha
+        self.heartbeat = heartbeat
+        self.enabled = enabled
+        self.background = None
+        self.changed = 0.0  # fraction of changed pixels in the last frame
+        self.people = 0  # detections in the last model result
+        self.last_inference = float("-inf")
+        self.inferred = 0
+        self.skipped = 0
+
+    def motion(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray
+            return True
+        diff = cv2.absdiff(gray, self.background)
+        cv2.accumulateWeighted(gray, self.background, self.background_alpha)
+        self.changed = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        return self.changed >= self.min_changed
+
+    def check(self, frame, now=None):
+        """True if `frame` should go through the model."""
+        if not self.enabled:
+            return True
+        now = time.time() if now is None else now
+        # The background is updated on every frame, inferred or not
+        moving = self.motion(frame)
+        if moving or self.people or now - self.last_inference >= self.heartbeat:
+            self.last_inference = now
+            self.inferred += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, people):
+        """Number of detections the model returned for the last inferred frame."""
+        self.people = people
@@ -1,40 +1,82 @@
-import os
-import sys
-import json 
-from typing import List 
-from dataclasses import dataclass
 import time
-import cv2
 import numpy as np
 from ultralytics import YOLO
-from config.loader import STREAMMAXLEN, MODEL
-from logs.log_handler import logger
-from reID import ReIDManager
+from config.loader import STREAMMAXLEN, MODEL, CONF_THRESHOLD, IOU_THRESHOLD
+from config.loader import READ_POLICY, READ_BLOCK_MS, READ_GROUP, FRAME_CODEC
+from config.loader import REID_THRESHOLD, REID_CAPACITY, REID_MAX_AGE, REID_WORKERS
+from config.loader import IDENTITY_MODE, TRACKER_CFG, LATENCY_LOG_INTERVAL
+from config.loader import LOAD_CONTROL_ENABLED, LOAD_BUDGET_MS, LOAD_WINDOW, LOAD_HEADROOM, LOAD_RECOVER_WINDOWS
+from config.loader import LOAD_STEPS
+from config.loader import MOTION_GATE_ENABLED, MOTION_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_CHANGED
+from config.loader import MOTION_BACKGROUND_ALPHA, MOTION_HEARTBEAT
+from config.loader import TILING_ENABLED, TILE_SIZE, TILE_OVERLAP, MAX_TILES, TILE_MERGE_THRESHOLD
+from config.loader import PUBLISH_MAX_BATCH, PUBLISH_FLUSH_MS, PUBLISH_MAX_QUEUE, PUBLISH_STATS_INTERVAL
+from identity import Detections, build_identity
+import frame_codec
+from stream_reader import StreamReader
+from frame_transport import FrameResolver, load_frame
+from latency import LatencyRecorder, stamp
+from load_control import LoadController
+from motion_gate import MotionGate
+from tiling import Tile, load_rois, make_tiles, to_arrays, to_frame, merge
+from publisher import StreamPublisher
+
+
+def load_model():
+    model = YOLO(MODEL)  # Ensure MODEL points to a YOLOv8 pose model
+    model.fuse()
+    return model
+
+
+def start_publisher(conn, name):
+    publisher = StreamPublisher(conn, name, max_batch=PUBLISH_MAX_BATCH, flush_ms=PUBLISH_FLUSH_MS,
+                                max_queue=PUBLISH_MAX_QUEUE, stats_interval=PUBLISH_STATS_INTERVAL)
+    publisher.start()
+    return publisher
+
 
 class PoseEstimator:
-    def __init__(self, cam_id):
-        self.model = YOLO(MODEL)  # Ensure MODEL points to a YOLOv8 pose model
+    def __init__(self, cam_id, model=None, latency=None):
+        # Several estimators can share one already loaded model and latency recorder
+        self.model = model if model is not None else load_model()
+        self.latency = latency if latency is not None else LatencyRecorder("tracking", LATENCY_LOG_INTERVAL)
         self.starttime = time.time()
-        self.model.fuse()
         self.redis_key = f"cam:{cam_id}"
         self.cam_id = cam_id
         self.tracked_key = f"tracked_cam:{cam_id}"
-        self.previous_index = None
         self.fps_window = []
-        self.fps_window_size = 10 
-        self.reid = ReIDManager()
-        self.next_id = 0  # Global ID counter
-
-    def estimate_pose(self, frame, count):
-        current_time = time.time()
-        results = self.model.predict(
-            frame,
-            conf=0.7,
-            iou=0.5,
-            verbose=False
+        self.fps_window_size = 10
+        self.identity = build_identity(
+            IDENTITY_MODE,
+            tracker_cfg=TRACKER_CFG,
+            reid_kwargs=dict(threshold=REID_THRESHOLD, capacity=REID_CAPACITY,
+                             max_age=REID_MAX_AGE, workers=REID_WORKERS),
         )
-        process_time = time.time()
-        frame_duration = process_time - current_time
+        self.frames = FrameResolver()
+        self.next_id = 0  # Global ID counter
+        self.control = LoadController(cam_id, LOAD_STEPS, LOAD_BUDGET_MS, window=LOAD_WINDOW, headroom=LOAD_HEADROOM,
+                                      recover_windows=LOAD_RECOVER_WINDOWS, enabled=LOAD_CONTROL_ENABLED)
+        reid = getattr(self.identity, "reid", None)
+        self.full_reid_crop = reid.crop_size if reid is not None else None
+        self.apply_load_step()
+        self.gate = MotionGate(width=MOTION_WIDTH, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                               min_changed=MOTION_MIN_CHANGED, background_alpha=MOTION_BACKGROUND_ALPHA,
+                               heartbeat=MOTION_HEARTBEAT, enabled=MOTION_GATE_ENABLED)
+
+    def apply_load_step(self):
+        """Applies the settings of the controller's current step that live outside predict()."""
+        reid = getattr(self.identity, "reid", None)
+        if reid is not None:
+            reid.crop_size = tuple(self.control.reid_crop or self.full_reid_crop)
+
+    def predict(self, frames):
+        """Runs the model on one frame or a list of frames at the current step's input size."""
+        args = dict(conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, verbose=False)
+        if self.control.imgsz:
+            args["imgsz"] = self.control.imgsz
+        return self.model.predict(frames, **args)
+
+    def update_fps(self, frame_duration):
         instant_fps = 1.0 / frame_duration if frame_duration > 0 else 0
 
         # FPS
@@ -42,92 +84,115 @@ class PoseEstimator:
         if len(self.fps_window) > self.fps_window_size:
             self.fps_window.pop(0)
 
-        smoothed_fps = sum(self.fps_window) / len(self.fps_window)
-
-
-        if not results or results[0].boxes is None or results[0].keypoints is None:
-            return []
-
-        detected_objects = []
-        boxes = results[0].boxes.data.cpu().numpy()
-        keypoints_data = results[0].keypoints.data.cpu().numpy()
-        classes = results[0].boxes.cls.cpu().numpy()
-        confs = results[0].boxes.conf.cpu().numpy()
-
-        for idx, (box, kps, cls_id, conf) in enumerate(zip(boxes, keypoints_data, classes, confs)):
-            x, y, w, h = box[:4]
-            x, y, w, h = int(x), int(y), int(w), int(h)
-            bbox = [x, y, w, h]
-            keypoints_2d = kps[:, :2].tolist()
-            keypoints_conf = kps[:, 2].tolist()
-
-            # ReID
-            person_img = frame[y:y+h, x:x+w]
-            if person_img.size == 0 or person_img.shape[0] == 0 or person_img.shape[1] == 0:
-                continue
-
-            embedding = self.reid.extract_embedding(person_img)
-            global_id = self.reid.match_or_create_global_id(embedding)
-
-            pose_data = {
-                "id": idx,
-                "cam_id": self.cam_id,
-                "class": int(cls_id),
-                "bbox": bbox,
-                "bbox_conf": float(conf),
-                "keypoints": keypoints_2d,
-                "keypoints_conf": keypoints_conf,
-                "status": " "
-            }
-            detected_objects.append(pose_data)
-
+        return sum(self.fps_window) / len(self.fps_window)
+
+    def tiles(self, data, frame, frame_info):
+        """The frame, plus overlapping tiles of the full-resolution ROIs the camera sent with it."""
+        rois = load_rois(data, frame_info) if TILING_ENABLED else []
+        return make_tiles(frame, rois, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_tiles=MAX_TILES)
+
+    def merge_results(self, tiles, results):
+        """Detections of all tiles in frame pixels, duplicates across tiles merged; None if there are none."""
+        parts = []
+        for tile, result in zip(tiles, results):
+            detections = to_arrays(result)
+            if detections is not None:
+                parts.append(to_frame(detections, tile))
+        return merge(parts, TILE_MERGE_THRESHOLD)
+
+    def postprocess(self, frame, detections, frame_duration):
+        smoothed_fps = self.update_fps(frame_duration)
+        # Everyone the model found, also people the tracker has not confirmed yet
+        self.gate.record(0 if detections is None else len(detections[0]))
+
+        if detections is None:
+            return frame_codec.empty_objects(), smoothed_fps
+
+        boxes, keypoints_data = detections
+        confs = boxes[:, 4]
+        classes = boxes[:, 5]
+
+        object_ids = self.identity.assign(frame, Detections(boxes[:, :4], confs, classes))
+        # Detections without an identity (not tracked yet, empty crop) are not emitted
+        keep = np.array([object_id is not None for object_id in object_ids], dtype=bool)
+
+        detected_objects = frame_codec.empty_objects(int(keep.sum()), keypoints_data.shape[1])
+        detected_objects["id"] = [object_id for object_id in object_ids if object_id is not None]
+        detected_objects["class"] = classes[keep]
+        detected_objects["bbox"] = boxes[keep, :4]
+        detected_objects["bbox_conf"] = confs[keep]
+        detected_objects["keypoints"] = keypoints_data[keep, :, :2]
+        detected_objects["keypoints_conf"] = keypoints_data[keep, :, 2]
 
         return detected_objects, smoothed_fps
 
-    def update(self, data, count):
-        byte_frame = data[b"frame"]
-        frame_info = json.loads(data[b"frame_info"])
-        frame = cv2.imdecode(np.frombuffer(byte_frame, np.uint8), cv2.IMREAD_COLOR)
-        pose_result, smoothed_fps = self.estimate_pose(frame, count)
-        
+    def estimate_pose(self, frame, count, frame_info=None, tiles=None):
+        tiles = tiles or [Tile(frame, 0.0, 0.0, 1.0)]
+        current_time = time.time()
+        # The frame and its ROI tiles go through the model as one batch
+        results = self.predict([tile.image for tile in tiles])
+        frame_duration = time.time() - current_time
+        if frame_info is not None:
+            stamp(frame_info, "tracking.inferred")
+        return self.postprocess(frame, self.merge_results(tiles, results), frame_duration)
+
+    def static_result(self, frame_info):
+        """Result for a frame the motion gate kept from the model: nobody, fps of the last model run."""
+        frame_info["gated"] = True
+        smoothed_fps = sum(self.fps_window) / len(self.fps_window) if self.fps_window else 0.0
+        return frame_codec.empty_objects(), smoothed_fps
+
+    def decode(self, data, received_at=None):
+        frame_info = frame_codec.decode(data[b"frame_info"])
+        stamp(frame_info, "tracking.received", received_at)
+        frame = load_frame(data, frame_info, self.frames)
+        stamp(frame_info, "tracking.decoded")
+        return frame, frame_info
+
+    def build_result(self, data, frame_info, pose_result, smoothed_fps):
+        # ROIs only feed tiles(), whichever path the frame took they are not forwarded
+        frame_info.pop("rois", None)
         frame_info["objects"] = pose_result
         frame_info["fps"] = smoothed_fps
-
-        result = {
-            "frame": byte_frame,
-            "frame_info": json.dumps(frame_info)
-        }
+        frame_info["identity_ms"] = self.identity.cost_ms
+        frame_info["load_step"] = self.control.level
+        stamp(frame_info, "tracking.published")
+        self.latency.observe(self.cam_id, frame_info)
+        if self.control.observe(frame_info):
+            self.apply_load_step()
+
+        result = {"frame_info": frame_codec.encode(frame_info, FRAME_CODEC)}
+        # With the shared-memory transport the frame stays referenced by frame_info
+        if b"frame" in data:
+            result["frame"] = data[b"frame"]
 
         return result
 
-    def get_data(self, conn):
-        try:
-            p = conn.pipeline()
-            p.xrevrange(self.redis_key, count=1)
-            msg = p.execute()
-
-            index = None
-            if msg and len(msg[0]) > 0:
-                index = msg[0][0][0].decode("utf-8")
-
-            if ((index is None) or 
-                (self.previous_index is not None and 
-                 self.previous_index == index)):
-                return None
-            
-            self.previous_index = index
-            data = msg[0][0][1]
-            return data
-        
-        except Exception as e:
-            logger.error(f"Error fetching data: {e}")
+    def update(self, data, count, received_at=None):
+        frame, frame_info = self.decode(data, received_at)
+        if frame is None:
             return None
-            
+        if self.gate.check(frame):
+            tiles = self.tiles(data, frame, frame_info)
+            pose_result, smoothed_fps = self.estimate_pose(frame, count, frame_info, tiles)
+        else:
+            pose_result, smoothed_fps = self.static_result(frame_info)
+        return self.build_result(data, frame_info, pose_result, smoothed_fps)
+
     def run(self, conn):
+        reader = StreamReader(conn, self.redis_key, policy=READ_POLICY, block_ms=READ_BLOCK_MS,
+                              group=READ_GROUP, consumer=f"tracking:{self.cam_id}")
+        publisher = start_publisher(conn, f"tracking:{self.cam_id}")
         count = 0
         while True:
-            data = self.get_data(conn)
-            if data:
-                result = self.update(data, count)
+            entries = reader.read().get(self.redis_key, [])
+            received_at = time.time()
+            for _, data in entries:
+                if not self.control.admit(received_at):
+                    continue
+                result = self.update(data, count, received_at)
+                if result is None:
+                    continue
                 count += 1
-                conn.xadd(self.tracked_key, result, maxlen=STREAMMAXLEN)
+                publisher.publish(self.tracked_key, result, maxlen=STREAMMAXLEN)
+                self.control.publish(conn)
@@ -0,0 +1,185 @@
+import time
+import threading
+from collections import deque, OrderedDict
+
+from logs.log_handler import logger
+
+
+class StreamPublisher(threading.Thread):
+    """
+    Shared, non-blocking XADD publisher for all cameras of a process.
+
+    `publish` only appends the entry to its stream's bounded queue; when
+    that queue is full (Redis is slower than the producer) the stream's
+    oldest entry is dropped and counted, so a slow Redis never stalls
+    capture or inference and a busy camera never evicts another one's
+    entries. A stream published with `maxlen` queues at most that many
+    entries, since Redis keeps no more of them anyway: frame streams hold
+    only the newest frames (and shm frame references stay within the
+    ring), while streams without `maxlen` queue up to `max_queue`.
+
+    A background thread sends up to `max_batch` queued entries in one
+    non-transactional pipeline, taking them round-robin over the streams,
+    as soon as `max_batch` are queued or `flush_ms` after the oldest one
+    was. Entries of one stream keep their order.
+
+    Every `stats_interval` seconds the queue depth, drops (also per stream)
+    and p50/p95 of the flush latency (pipeline round trip) and queue wait
+    are logged and written to the `publisher_stats:{name}` hash.
+    """
+
+    def __init__(self, conn, name, max_batch=64, flush_ms=5, max_queue=256, stats_interval=60):
+        super().__init__(daemon=True, name=f"publisher-{name}")
+        self.conn = conn
+        self.stats_key = f"publisher_stats:{name}"
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = flush_ms / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.queues = OrderedDict()  # stream key -> deque of (fields, maxlen, queued_at)
+        self.size = 0
+        self.oldest = None  # queued_at of the oldest queued entry
+        self.in_flight = ()  # stream keys of the batch being sent
+        self.cond = threading.Condition()
+        self.stopped = threading.Event()
+        self.stats_interval = stats_interval
+        self.last_stats_time = time.time()
+        self.flush_ms = deque(maxlen=1000)
+        self.wait_ms = deque(maxlen=1000)
+        self.counters = {"published": 0, "dropped": 0, "failed": 0, "flushes": 0}
+        self.dropped = {}  # stream key -> entries dropped from its full queue
+
+    def publish(self, key, fields, maxlen=None):
+        now = time.time()
+        with self.cond:
+            queue = self.queues.get(key)
+            if queue is None:
+                bound = min(self.max_queue, maxlen) if maxlen else self.max_queue
+                queue = self.queues[key] = deque(maxlen=max(1, int(bound)))
+            if len(queue) == queue.maxlen:
+                # append() below pushes out this stream's oldest entry
+                self.counters["dropped"] += 1
+                self.dropped[key] = self.dropped.get(key, 0) + 1
+                self.size -= 1
+            queue.append((fields, maxlen, now))
+            self.size += 1
+            if self.oldest is None:
+                self.oldest = now
+            # The first entry starts the flush_ms countdown, a full batch goes right away
+            if self.size == 1 or self.size >= self.max_batch:
+                self.cond.notify_all()
+
+    def discard(self, key, timeout=5.0):
+        """
+        Forgets the queued entries of `key` and waits until a batch being
+        sent no longer contains it, so deleting the stream afterwards sticks.
+        """
+        with self.cond:
+            queue = self.queues.pop(key, None)
+            if queue:
+                self.size -= len(queue)
+                self.oldest = self.head_time()
+            self.cond.wait_for(lambda: key not in self.in_flight, timeout)
+
+    def head_time(self):
+        times = [queue[0][2] for queue in self.queues.values() if queue]
+        return min(times) if times else None
+
+    def take(self):
+        """Waits for the next batch: `max_batch` entries, or whatever is queued `flush_ms` after the oldest."""
+        with self.cond:
+            while not self.stopped.is_set():
+                if self.size >= self.max_batch:
+                    break
+                if self.size:
+                    remaining = self.oldest + self.flush_interval - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                else:
+                    self.cond.wait(1.0)
+                    if not self.size:
+                        break  # idle: let run() report all the same
+            batch = []
+            while self.size and len(batch) < self.max_batch:
+                # One entry per stream and round, served streams go to the back
+                for key in list(self.queues):
+                    queue = self.queues[key]
+                    if queue:
+                        batch.append((key, *queue.popleft()))
+                        self.size -= 1
+                    if not queue:
+                        del self.queues[key]
+                    else:
+                        self.queues.move_to_end(key)
+                    if len(batch) == self.max_batch:
+                        break
+            self.oldest = self.head_time()
+            self.in_flight = {key for key, _, _, _ in batch}
+            return batch
+
+    def flush(self, batch):
+        if not batch:
+            return
+        started = time.time()
+        p = self.conn.pipeline(transaction=False)
+        for key, fields, maxlen, _ in batch:
+            p.xadd(key, fields, maxlen=maxlen)
+        try:
+            p.execute()
+        except Exception as e:
+            self.counters["failed"] += len(batch)
+            logger.error(f"Failed to publish {len(batch)} entries: {e}")
+            # Back off a little; meanwhile the bounded queues shed their oldest entries
+            self.stopped.wait(min(1.0, 10 * self.flush_interval + 0.1))
+            return
+        finished = time.time()
+        self.counters["published"] += len(batch)
+        self.counters["flushes"] += 1
+        self.flush_ms.append(1000 * (finished - started))
+        self.wait_ms.append(1000 * (started - min(queued_at for _, _, _, queued_at in batch)))
+
+    def sent(self):
+        with self.cond:
+            self.in_flight = ()
+            self.cond.notify_all()
+
+    def stats(self):
+        stats = dict(self.counters, queued=self.size, flush_p50_ms=percentile(self.flush_ms, 50),
+                     flush_p95_ms=percentile(self.flush_ms, 95), wait_p50_ms=percentile(self.wait_ms, 50),
+                     wait_p95_ms=percentile(self.wait_ms, 95))
+        stats.update({f"dropped:{key}": count for key, count in self.dropped.items()})
+        return stats
+
+    def report(self):
+        if not self.stats_interval or time.time() - self.last_stats_time < self.stats_interval:
+            return
+        self.last_stats_time = time.time()
+        stats = self.stats()
+        logger.info(f"Publisher stats: {stats}")
+        try:
+            self.conn.hset(self.stats_key, mapping={key: round(value, 2) for key, value in stats.items()})
+        except Exception as e:
+            logger.error(f"Failed to write {self.stats_key}: {e}")
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.flush(self.take())
+            self.sent()
+            self.report()
+        while self.size:
+            self.flush(self.take())
+            self.sent()
+
+    def close(self):
+        self.stopped.set()
+        with self.cond:
+            self.cond.notify_all()
+        if self.is_alive():
+            self.join()
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
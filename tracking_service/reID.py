@@ -1,12 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.optimize import linear_sum_assignment
+
 
 class ReIDManager:
-    def __init__(self, threshold=0.8):
-        self.gallery = {}  # {global_id: embedding}
+    """
+    Appearance gallery for re-identification.
+
+    Embeddings live in a preallocated, L2-normalized (capacity, dim) matrix, so
+    all detections of a frame are matched with one matrix product followed by
+    Hungarian assignment. Matched entries are updated with a running mean,
+    entries unseen for `max_age` seconds are freed and, when the gallery is
+    full, the least recently seen entry is evicted.
+    """
+
+    def __init__(self, threshold=0.8, capacity=1000, max_age=300.0, dim=512, max_count=100, workers=0):
         self.threshold = threshold
+        self.capacity = capacity
+        self.max_age = max_age
+        self.max_count = max_count  # caps the running mean so old looks fade out
+        self.embeddings = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
         self.global_id_counter = 0
+        self.expire_interval = 1.0
+        self.last_expire_time = 0.0
+        # (width, height) crops are resized to before binning; smaller is cheaper
+        self.crop_size = (64, 128)
+        # OpenCV releases the GIL, so crop resizing scales across a few threads
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def __len__(self):
+        return self.capacity - len(self.free)
 
     def extract_embedding(self, img_np):
         try:
@@ -20,24 +51,123 @@ class ReIDManager:
             print(f"Error extracting histogram: {e}")
             return None
 
-    def match_or_create_global_id(self, embedding):
-        if embedding is None:
-            return None
+    def extract_embeddings(self, frame, boxes):
+        """
+        Histogram embeddings for all `boxes` (N, 4 xyxy) of `frame` in one pass.
+        Returns an (N, 512) float32 array; boxes that are empty after clipping
+        to the frame get a row of zeros.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        embeddings = np.zeros((len(boxes), 512), dtype=np.float32)
+        if frame is None or not len(boxes):
+            return embeddings
 
-        best_id = None
-        best_score = -1
+        height, width = frame.shape[:2]
+        boxes = np.round(boxes).astype(np.int64)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+        valid = np.flatnonzero((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1]))
+        if not valid.size:
+            return embeddings
 
-        for global_id, stored_emb in self.gallery.items():
-            score = cosine_similarity(embedding, stored_emb)[0][0]
-            if score > best_score:
-                best_score = score
-                best_id = global_id
+        crop_size = tuple(self.crop_size)
 
-        if best_score >= self.threshold:
-            return best_id
+        def crop(i):
+            x1, y1, x2, y2 = boxes[i]
+            return cv2.resize(frame[y1:y2, x1:x2], crop_size)
 
-        # Nếu không đủ điểm thì tạo ID mới
+        if self.executor is not None and valid.size > 1:
+            crops = list(self.executor.map(crop, valid))
+        else:
+            crops = [crop(i) for i in valid]
+
+        # One colour conversion for all crops stacked into a single image
+        hsv = cv2.cvtColor(np.concatenate(crops, axis=0), cv2.COLOR_BGR2HSV)
+        hsv = hsv.reshape(len(crops), -1, 3)
+        # Same 8x8x8 binning as calcHist over [0, 180) x [0, 256) x [0, 256)
+        bins = (hsv[..., 0].astype(np.int32) * 8 // 180) * 64 + (hsv[..., 1] >> 5) * 8 + (hsv[..., 2] >> 5)
+        bins += np.arange(len(crops), dtype=np.int32)[:, None] * 512
+        hist = np.bincount(bins.ravel(), minlength=len(crops) * 512).reshape(len(crops), 512)
+        hist = hist.astype(np.float32)
+        hist /= np.linalg.norm(hist, axis=1, keepdims=True)
+        embeddings[valid] = hist
+        return embeddings
+
+    def expire(self, now):
+        if now - self.last_expire_time < self.expire_interval:
+            return
+        self.last_expire_time = now
+        stale = np.flatnonzero(self.active & (now - self.last_seen > self.max_age))
+        for row in stale:
+            self.release(row)
+
+    def release(self, row):
+        self.active[row] = False
+        self.embeddings[row] = 0
+        self.free.append(int(row))
+
+    def insert(self, embedding, now):
+        if not self.free:
+            active_rows = np.flatnonzero(self.active)
+            self.release(active_rows[np.argmin(self.last_seen[active_rows])])
+        row = self.free.pop()
         self.global_id_counter += 1
-        new_id = str(self.global_id_counter)
-        self.gallery[new_id] = embedding
-        return new_id
+        self.embeddings[row] = embedding
+        self.ids[row] = self.global_id_counter
+        self.counts[row] = 1
+        self.last_seen[row] = now
+        self.active[row] = True
+        return self.global_id_counter
+
+    def update(self, row, embedding, now):
+        n = min(self.counts[row], self.max_count)
+        mean = (self.embeddings[row] * n + embedding) / (n + 1)
+        norm = np.linalg.norm(mean)
+        if norm > 0:
+            self.embeddings[row] = mean / norm
+        self.counts[row] += 1
+        self.last_seen[row] = now
+
+    def match_or_create_global_ids(self, embeddings, now=None):
+        """
+        embeddings: (N, dim) array, rows of zeros mark detections to skip.
+        Returns a list of N global IDs (None for skipped rows).
+        """
+        now = time.time() if now is None else now
+        self.expire(now)
+
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embeddings.shape[1])
+        norms = np.linalg.norm(embeddings, axis=1)
+        valid = np.flatnonzero(norms > 0)
+        global_ids = [None] * len(embeddings)
+        if valid.size == 0:
+            return global_ids
+        queries = embeddings[valid] / norms[valid, None]
+
+        matched = set()
+        if self.active.any():
+            scores = queries @ self.embeddings.T
+            scores[:, ~self.active] = -1.0
+            # Only gallery entries that clear the threshold for someone can be assigned
+            candidates = np.flatnonzero((scores >= self.threshold).any(axis=0))
+            if candidates.size:
+                sub = scores[:, candidates]
+                rows, cols = linear_sum_assignment(sub, maximize=True)
+                for r, c in zip(rows, cols):
+                    if sub[r, c] < self.threshold:
+                        continue
+                    row = candidates[c]
+                    self.update(row, queries[r], now)
+                    global_ids[valid[r]] = int(self.ids[row])
+                    matched.add(r)
+
+        # Nếu không đủ điểm thì tạo ID mới
+        for r in range(len(valid)):
+            if r not in matched:
+                global_ids[valid[r]] = self.insert(queries[r], now)
+        return global_ids
+
+    def match_or_create_global_id(self, embedding):
+        if embedding is None:
+            return None
+        return self.match_or_create_global_ids(embedding)[0]
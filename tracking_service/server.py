@@ -1,24 +1,59 @@
-import sys
-import signal
-import multiprocessing
+import time
 from multiprocessing import Process
 
 import redis
 
 from pose_estimate import PoseEstimator
-from config.loader import REDIS_HOSTNAME, REDIS_PORT, CAMERAS
+from batch_inference import BatchInferenceWorker
+from camera_updates import CameraUpdates, ADD, REMOVE
+from config.loader import REDIS_HOSTNAME, REDIS_PORT, CAMERAS, INFERENCE_MODE
+from logs.log_handler import logger
 
 
 r = redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
 
 def run_tracker(camera_info):
     tracker = PoseEstimator(camera_info["id"])
-    tracker.run(r)  
+    tracker.run(r)
 
-if __name__ == "__main__":
-    processes = list()
+def run_batched(cameras):
+    # Cameras added or deleted later join the running worker and its loaded model
+    updates = CameraUpdates(r)
+    updates.start()
+    worker = BatchInferenceWorker([camera_info["id"] for camera_info in cameras])
+    worker.run(r, updates)
+
+def start_tracker(camera_info):
+    p = Process(target=run_tracker, args=(camera_info,))
+    p.start()
+    return p
 
-    for camera_info in CAMERAS:
-        print(camera_info)
-        p = Process(target=run_tracker, args=(camera_info,))
-        p.start()
\ No newline at end of file
+def manage_trackers(processes):
+    """per_camera mode: starts and stops one tracker process per camera as cameras are added and deleted."""
+    updates = CameraUpdates(r)
+    updates.start()
+    while True:
+        for action, camera_info in updates.pending():
+            camera_id = camera_info["id"]
+            if action == ADD and camera_id not in processes:
+                logger.info(f"Starting tracker for camera {camera_id}")
+                processes[camera_id] = start_tracker(camera_info)
+            elif action == REMOVE and camera_id in processes:
+                p = processes.pop(camera_id)
+                p.terminate()
+                p.join()
+                r.delete(f"tracked_cam:{camera_id}", f"load_control:{camera_id}")
+        time.sleep(0.5)
+
+if __name__ == "__main__":
+    if INFERENCE_MODE == "batched":
+        logger.info(f"Tracking cameras {[camera_info['id'] for camera_info in CAMERAS]} in one batched worker")
+        p = Process(target=run_batched, args=(CAMERAS,))
+        p.start()
+        p.join()
+    else:
+        processes = dict()
+        for camera_info in CAMERAS:
+            logger.info(f"Starting tracker for camera {camera_info['id']}")
+            processes[camera_info["id"]] = start_tracker(camera_info)
+        manage_trackers(processes)
@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# An image given to the model; a pixel p of it is at x + p / scale (and y) in the published frame.
+Tile = namedtuple("Tile", ["image", "x", "y", "scale"])
+
+
+def windows(length, tile, overlap):
+    """Start offsets of `tile`-long windows covering `length`, neighbours sharing ~`overlap` of a tile."""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+
+def load_rois(data, frame_info):
+    """Full-resolution ROI crops the camera published next to the frame, as (image, roi) pairs."""
+    rois = []
+    for i, roi in enumerate(frame_info.get("rois", [])):
+        raw = data.get(f"roi_{i}".encode())
+        if raw is None:
+            continue
+        image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            rois.append((image, roi))
+    return rois
+
+
+def make_tiles(frame, rois, tile_size=640, overlap=0.2, max_tiles=8):
+    """
+    The frame itself, then every ROI crop cut into overlapping windows of at
+    most `tile_size` pixels. At most `max_tiles` ROI windows are returned.
+    """
+    tiles = [Tile(frame, 0.0, 0.0, 1.0)]
+    for image, roi in rois:
+        height, width = image.shape[:2]
+        for y in windows(height, tile_size, overlap):
+            for x in windows(width, tile_size, overlap):
+                if len(tiles) > max_tiles:
+                    return tiles
+                crop = image[y:y + tile_size, x:x + tile_size]
+                scale = roi["scale"]
+                tiles.append(Tile(crop, roi["x"] + x / scale, roi["y"] + y / scale, scale))
+    return tiles
+
+
+def to_arrays(result):
+    """(boxes (N, 6) x1 y1 x2 y2 conf cls, keypoints (N, K, 3) x y conf) of one ultralytics result, or None."""
+    if result is None or result.boxes is None or result.keypoints is None:
+        return None
+    data = result.boxes.data.cpu().numpy()
+    boxes = np.concatenate([data[:, :4], result.boxes.conf.cpu().numpy()[:, None],
+                            result.boxes.cls.cpu().numpy()[:, None]], axis=1)
+    return boxes, result.keypoints.data.cpu().numpy()
+
+
+def to_frame(detections, tile):
+    """Maps tile-pixel detections into frame pixels."""
+    boxes, keypoints = detections
+    if tile.scale == 1.0 and not tile.x and not tile.y:
+        return boxes, keypoints
+    boxes = boxes.copy()
+    keypoints = keypoints.copy()
+    offset = np.array([tile.x, tile.y], dtype=boxes.dtype)
+    boxes[:, 0:2] = offset + boxes[:, 0:2] / tile.scale
+    boxes[:, 2:4] = offset + boxes[:, 2:4] / tile.scale
+    keypoints[..., :2] = offset + keypoints[..., :2] / tile.scale
+    return boxes, keypoints
+
+
+def merge(parts, threshold=0.6):
+    """
+    Concatenates per-tile detections (already in frame pixels) and keeps,
+    greedily by confidence, those whose intersection with every kept box
+    of another tile covers less than `threshold` of the smaller of the
+    two. Using the smaller box instead of the union also merges a person
+    cut at a tile edge with the full detection from the frame or the next
+    tile. Boxes of the same tile were already through the model's NMS and
+    never suppress each other, so overlapping people stay apart.
+    """
+    parts = [part for part in parts if part is not None and len(part[0])]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    boxes = np.concatenate([boxes for boxes, _ in parts])
+    keypoints = np.concatenate([keypoints for _, keypoints in parts])
+    sources = np.concatenate([np.full(len(part_boxes), i) for i, (part_boxes, _) in enumerate(parts)])
+
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    order = np.argsort(-boxes[:, 4], kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0])
+        h = np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1])
+        inter = np.maximum(w, 0) * np.maximum(h, 0)
+        smaller = np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        order = rest[(inter / smaller < threshold) | (sources[rest] == sources[i])]
+    keep = np.array(keep)
+    return boxes[keep], keypoints[keep]
@@ -1,11 +1,76 @@
-from typing import List, Optional, Union
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional, Union
 
 import cv2
 import numpy as np
-from logs.log_handler import logger
 
 from supervision.draw.color import Color, ColorPalette
 
+# A pre-rendered patch; placed so that (x + dx, y + dy) is its top-left corner.
+# alpha is None for fully opaque patches, otherwise a per-pixel coverage mask.
+Sprite = namedtuple("Sprite", ["bgr", "alpha", "dx", "dy"])
+
+ANCHOR_COLORS = {"center": (0, 255, 0), "right": (0, 0, 255), "left": (255, 0, 0)}
+# Below this many dots, one cv2.circle each is cheaper than the fixed cost of stamp()
+STAMP_MIN_POINTS = 16
+
+
+def blit(scene, sprite, x, y):
+    """Alpha-blends `sprite` into `scene` at (x, y), clipped to the image."""
+    h, w = sprite.bgr.shape[:2]
+    top, left = y + sprite.dy, x + sprite.dx
+    y0, x0 = max(top, 0), max(left, 0)
+    y1, x1 = min(top + h, scene.shape[0]), min(left + w, scene.shape[1])
+    if y0 >= y1 or x0 >= x1:
+        return
+    patch = sprite.bgr[y0 - top:y1 - top, x0 - left:x1 - left]
+    roi = scene[y0:y1, x0:x1]
+    if sprite.alpha is None:
+        roi[:] = patch
+        return
+    alpha = sprite.alpha[y0 - top:y1 - top, x0 - left:x1 - left, None].astype(np.uint16)
+    roi[:] = (roi * (255 - alpha) + patch * alpha + 127) // 255
+
+
+def stamp(scene, sprite, points):
+    """
+    Blends the same small single-color sprite at many points in one
+    vectorized pass over its covered pixels only. Returns the points that
+    did not fit entirely inside the image.
+    """
+    h, w = sprite.alpha.shape
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    tops = points[:, 1] + sprite.dy
+    lefts = points[:, 0] + sprite.dx
+    inside = (tops >= 0) & (lefts >= 0) & (tops + h <= scene.shape[0]) & (lefts + w <= scene.shape[1])
+    if inside.any():
+        ys, xs = np.nonzero(sprite.alpha)
+        alpha = sprite.alpha[ys, xs].astype(np.uint16)[None, :, None]
+        offsets = (ys + sprite.dy) * scene.shape[1] + xs + sprite.dx
+        flat = scene.reshape(-1, 3)
+        index = (points[inside, 1] * scene.shape[1] + points[inside, 0])[:, None] + offsets[None, :]
+        roi = flat[index].astype(np.uint16)
+        flat[index] = (roi * (255 - alpha) + sprite.bgr[0, 0].astype(np.uint16) * alpha + 127) // 255
+    return points[~inside]
+
+
+def dots(scene, sprite, points, radius, color):
+    """Anti-aliased filled dots at `points`, stamped from `sprite` when there are enough of them."""
+    if len(points) >= STAMP_MIN_POINTS:
+        points = stamp(scene, sprite, points)
+    for px, py in points:
+        cv2.circle(scene, (int(px), int(py)), radius=radius, color=color, thickness=-1, lineType=cv2.LINE_AA)
+
+
+def dot_sprite(radius, color):
+    size = 2 * radius + 3
+    alpha = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(alpha, (radius + 1, radius + 1), radius=radius, color=255, thickness=-1, lineType=cv2.LINE_AA)
+    bgr = np.empty((size, size, 3), dtype=np.uint8)
+    bgr[:] = color
+    return Sprite(bgr, alpha, -(radius + 1), -(radius + 1))
+
 
 class Annotator:
     def __init__(
@@ -16,7 +81,8 @@ class Annotator:
         text_scale: float = 0.5,
         text_thickness: int = 1,
         text_padding: int = 10,
-        anchor = "center"
+        anchor = "center",
+        sprite_cache_size: int = 512,
     ):
         self.color: Union[Color, ColorPalette] = color
         self.thickness: int = thickness
@@ -25,118 +91,85 @@ class Annotator:
         self.text_thickness: int = text_thickness
         self.text_padding: int = text_padding
         self.anchor = anchor
+        # Rendered text, keyed by everything that changes its pixels; LRU once full.
+        # Shared by the render threads of all cameras.
+        self.sprite_cache_size = sprite_cache_size
+        self.sprites = OrderedDict()
+        self.sprites_lock = threading.Lock()
+        self.keypoint_dot = dot_sprite(3, (255, 165, 0))
+        self.anchor_dot = dot_sprite(5, ANCHOR_COLORS.get(anchor, (0, 255, 0)))
+
+    def text_sprite(self, text, font_scale, color, thickness, padding=0, background=None):
+        """
+        `text` rasterized once. With a background the sprite is the opaque
+        label box (padding around the text, as the label used to be drawn);
+        without one it is the anti-aliased glyph coverage used as alpha.
+        Positioned relative to the text origin, like cv2.putText.
+        """
+        key = (text, font_scale, color, thickness, padding, background)
+        with self.sprites_lock:
+            sprite = self.sprites.get(key)
+            if sprite is not None:
+                self.sprites.move_to_end(key)
+                return sprite
 
-    def annotate(self, scene: np.ndarray, detections, fps: Optional[float] = None, skip_label= False):
         font = cv2.FONT_HERSHEY_SIMPLEX
+        (text_width, text_height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        if background is not None:
+            bgr = np.empty((2 * padding + text_height + 1, 2 * padding + text_width + 1, 3), dtype=np.uint8)
+            bgr[:] = background
+            cv2.putText(bgr, text, (padding, padding + text_height), font, font_scale, color, thickness, cv2.LINE_AA)
+            sprite = Sprite(bgr, None, -padding, -padding - text_height)
+        else:
+            margin = thickness + 1
+            alpha = np.zeros((text_height + baseline + 2 * margin, text_width + 2 * margin), dtype=np.uint8)
+            cv2.putText(alpha, text, (margin, margin + text_height), font, font_scale, 255, thickness, cv2.LINE_AA)
+            bgr = np.empty(alpha.shape + (3,), dtype=np.uint8)
+            bgr[:] = color
+            sprite = Sprite(bgr, alpha, -margin, -margin - text_height)
+
+        with self.sprites_lock:
+            self.sprites[key] = sprite
+            while len(self.sprites) > self.sprite_cache_size:
+                self.sprites.popitem(last=False)
+        return sprite
 
+    def annotate(self, scene: np.ndarray, detections, fps: Optional[float] = None, skip_label= False):
         if fps is not None:
-            fps_text = f"FPS: {int(fps)}"
-            cv2.putText(
-                scene, 
-                fps_text, 
-                (scene.shape[1] - 120, 30),
-                font, 
-                0.7, 
-                (0, 255, 0), 
-                2, 
-                cv2.LINE_AA
-            )
-
-        for i in detections:
-            x1, y1, x2, y2 = i["bbox"]
-            class_id = i["id"] if i["id"] is not None else None
-
-            if i["fall_detected"]:
-                color = (0, 0, 255)
-            else:
-                color = (255, 0, 0) 
-
-            cv2.rectangle(
-                img=scene,
-                pt1=(x1, y1),
-                pt2=(x2, y2),
-                color=color,
-                thickness=self.thickness,
-            )
-
-            if self.anchor == "center":
-                cv2.circle(
-                    scene,
-                    (int((x2 + x1)/2), y2),
-                    radius=5,
-                    color=(0, 255, 0),
-                    thickness=-1,
-                    lineType=cv2.LINE_AA,
-                )
-            elif self.anchor == "right":
-                cv2.circle(
-                    scene,
-                    (x2, y2),
-                    radius=5,
-                    color=(0, 0, 255),
-                    thickness=-1,
-                    lineType=cv2.LINE_AA,
-                )
-            elif self.anchor == "left":
-                cv2.circle(
-                    scene,
-                    (x1, y2),
-                    radius=5,
-                    color=(255, 0, 0),
-                    thickness=-1,
-                    lineType=cv2.LINE_AA,
-                )
-
-            keypoints = i["keypoints"]
-            if keypoints and len(keypoints) == 8:
-                for kp in keypoints:
-                    x, y = int(kp[0]), int(kp[1])
-                    cv2.circle(scene, (x, y), radius=3, color=(255, 165, 0), thickness=-1, lineType=cv2.LINE_AA)
-
-            if i["fall_detected"]:
-                object_status = "fall"
-            else:
-                object_status = "normal"
-
-            if skip_label:
-                continue
-
-            text = f"ID: {i['id']} - Status: {object_status}"
-
-            text_width, text_height = cv2.getTextSize(
-                text=text,
-                fontFace=font,
-                fontScale=self.text_scale,
-                thickness=self.text_thickness,
-            )[0]
-
-            text_x = x1 + self.text_padding
-            text_y = y1 - self.text_padding
-
-            text_background_x1 = x1
-            text_background_y1 = y1 - 2 * self.text_padding - text_height
-
-            text_background_x2 = x1 + 2 * self.text_padding + text_width
-            text_background_y2 = y1
-
-            cv2.rectangle(
-                img=scene,
-                pt1=(text_background_x1, text_background_y1),
-                pt2=(text_background_x2, text_background_y2),
-                color=(255, 0, 0),
-                thickness=cv2.FILLED,
-            )
-
-            cv2.putText(
-                img=scene,
-                text=text,
-                org=(text_x, text_y),
-                fontFace=font,
-                fontScale=self.text_scale,
-                color=self.text_color.as_rgb(),
-                thickness=self.text_thickness,
-                lineType=cv2.LINE_AA,
-            )
+            # A single short label: putText beats blending a sprite of it
+            cv2.putText(scene, f"FPS: {int(fps)}", (scene.shape[1] - 120, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                        (0, 255, 0), 2, cv2.LINE_AA)
+
+        if not len(detections):
+            return scene
+
+        boxes = detections["bbox"].astype(np.int32)
+        fallen = detections["fall_detected"].astype(bool)
+
+        # One polyline call per color instead of a rectangle per person
+        corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+        for color, mask in (((255, 0, 0), ~fallen), ((0, 0, 255), fallen)):
+            if mask.any():
+                cv2.polylines(scene, list(corners[mask]), True, color, self.thickness)
+
+        if self.anchor in ANCHOR_COLORS:
+            x = {"center": (boxes[:, 0] + boxes[:, 2]) // 2, "right": boxes[:, 2], "left": boxes[:, 0]}[self.anchor]
+            dots(scene, self.anchor_dot, np.stack([x, boxes[:, 3]], axis=1), 5, ANCHOR_COLORS[self.anchor])
+
+        keypoints = detections["keypoints"]
+        if keypoints.shape[1] == 8:
+            points = keypoints.reshape(-1, 2)
+            points = points[np.isfinite(points).all(axis=1)].astype(np.int64)
+            dots(scene, self.keypoint_dot, points, 3, (255, 165, 0))
+
+        if skip_label:
+            return scene
+
+        for i, box, is_fallen in zip(detections["id"], boxes, fallen):
+            object_status = "fall" if is_fallen else "normal"
+            text = f"ID: {i} - Status: {object_status}"
+            sprite = self.text_sprite(text, self.text_scale, self.text_color.as_rgb(), self.text_thickness,
+                                      padding=self.text_padding, background=(255, 0, 0))
+            blit(scene, sprite, int(box[0]) + self.text_padding, int(box[1]) - self.text_padding)
 
         return scene
-
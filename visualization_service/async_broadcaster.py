@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+from logs.log_handler import logger
+from stream_reader import AsyncStreamReader
+from frame_transport import FrameResolver
+from broadcaster import BOUNDARY, render_jpeg
+
+
+class AsyncFrameBroadcaster:
+    """
+    asyncio counterpart of FrameBroadcaster for server_asgi.py.
+
+    A task per camera reads `fall_cam:{cam_id}` with an AsyncStreamReader
+    over a `redis.asyncio` client and renders each new frame once in the default executor, so
+    decoding, annotating and encoding never block the event loop. Viewers
+    are async generators that wait on an Event replaced on every frame; a
+    viewer whose socket is slow skips to the newest frame (counted in
+    `dropped`).
+    """
+
+    def __init__(self, conn, cam_id, render, policy, block_ms, latency=None):
+        self.conn = conn
+        self.cam_id = cam_id
+        self.key = f"fall_cam:{cam_id}"
+        self.render = render
+        self.policy = policy
+        self.block_ms = block_ms
+        self.latency = latency
+        self.frame_ready = asyncio.Event()
+        self.stopped = False
+        self.task = None
+        self.jpeg = None
+        self.seq = 0  # number of frames encoded so far
+        self.subscribers = 0
+        self.dropped = 0
+        self.reader = AsyncStreamReader(conn, self.key, policy=policy, block_ms=block_ms)
+        self.idle_since = time.time()
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        self.stopped = True
+        if self.task is not None:
+            self.task.cancel()
+        self.frame_ready.set()
+
+    def publish(self, jpeg):
+        self.jpeg = jpeg
+        self.seq += 1
+        frame_ready, self.frame_ready = self.frame_ready, asyncio.Event()
+        frame_ready.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        frames = FrameResolver()
+        while not self.stopped:
+            try:
+                entries = (await self.reader.read()).get(self.key, [])
+                received_at = time.time()
+                for _, data in entries:
+                    jpeg = await loop.run_in_executor(None, render_jpeg, data, frames, self.render, self.cam_id,
+                                                      self.latency, received_at)
+                    if jpeg is not None:
+                        self.publish(jpeg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcaster for cam {self.cam_id} failed: {e}")
+                await asyncio.sleep(1.0)
+
+    def subscribe(self):
+        """MJPEG multipart chunks for one client; it counts as a subscriber once the generator starts."""
+        if not self.subscribers:
+            # restart the idle clock, so the reaper leaves it running until the client starts reading
+            self.idle_since = time.time()
+        return self.stream()
+
+    async def stream(self):
+        # counted here, not in subscribe(): a generator closed before its first anext() never runs `finally`
+        self.subscribers += 1
+        self.idle_since = None
+        try:
+            last_seq = 0
+            while not self.stopped:
+                if self.seq == last_seq:
+                    await self.frame_ready.wait()
+                    continue
+                if last_seq:
+                    self.dropped += self.seq - last_seq - 1
+                last_seq = self.seq
+                yield BOUNDARY + self.jpeg + b"\r\n"
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers:
+                self.idle_since = time.time()
+
+    def stats(self):
+        # skipped: stream entries never rendered under the latest policy
+        return {"subscribers": self.subscribers, "frames": self.seq, "dropped": self.dropped,
+                "skipped": self.reader.dropped[self.key]}
+
+
+class AsyncBroadcasterRegistry:
+    """BroadcasterRegistry for the event loop: lazy start on first viewer, stop after `idle_timeout`."""
+
+    def __init__(self, conn, render, policy, block_ms, idle_timeout=30.0, latency=None):
+        self.conn = conn
+        self.render = render  # cam_id -> render(frame, frame_info)
+        self.policy = policy
+        self.block_ms = block_ms
+        self.idle_timeout = idle_timeout
+        self.latency = latency
+        self.broadcasters = {}
+        self.reaper = None
+
+    def start(self):
+        self.reaper = asyncio.ensure_future(self.reap())
+
+    def stop(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+        for broadcaster in self.broadcasters.values():
+            broadcaster.stop()
+        self.broadcasters.clear()
+
+    def subscribe(self, cam_id):
+        broadcaster = self.broadcasters.get(cam_id)
+        if broadcaster is None:
+            broadcaster = AsyncFrameBroadcaster(self.conn, cam_id, self.render(cam_id), policy=self.policy,
+                                                block_ms=self.block_ms, latency=self.latency)
+            broadcaster.start()
+            self.broadcasters[cam_id] = broadcaster
+            logger.info(f"Started render worker for cam {cam_id}")
+        return broadcaster.subscribe()
+
+    async def reap(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 5.0))
+            now = time.time()
+            for cam_id, broadcaster in list(self.broadcasters.items()):
+                idle_since = broadcaster.idle_since
+                if idle_since is not None and now - idle_since >= self.idle_timeout:
+                    broadcaster.stop()
+                    del self.broadcasters[cam_id]
+                    logger.info(f"Stopped idle render worker for cam {cam_id}")
+
+    def stats(self):
+        cameras = {cam_id: broadcaster.stats() for cam_id, broadcaster in self.broadcasters.items()}
+        return {
+            "active_workers": len(cameras),
+            "subscribers": sum(camera["subscribers"] for camera in cameras.values()),
+            "cameras": cameras,
+        }
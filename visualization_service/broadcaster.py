@@ -0,0 +1,188 @@
+import threading
+import time
+
+import cv2
+
+from logs.log_handler import logger
+from stream_reader import StreamReader
+from frame_transport import FrameResolver, load_frame
+from latency import stamp
+import frame_codec
+
+BOUNDARY = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+def render_jpeg(data, frames, render, cam_id, latency=None, received_at=None):
+    """Decodes one fall_cam entry, renders it and returns the JPEG bytes (None if unavailable)."""
+    frame_info = frame_codec.decode(data[b"frame_info"])
+    stamp(frame_info, "visualization.received", received_at)
+    # JPEG bytes, or a shared-memory reference that is only encoded here
+    frame = load_frame(data, frame_info, frames)
+    if frame is None:
+        return None
+    stamp(frame_info, "visualization.decoded")
+
+    frame = render(frame, frame_info)
+    stamp(frame_info, "visualization.annotated")
+    ret, buffer = cv2.imencode(".jpg", frame)
+    if not ret:
+        logger.debug(f"Failed to encode frame from cam {cam_id}")
+        return None
+    stamp(frame_info, "visualization.encoded")
+    if latency is not None:
+        latency.observe(cam_id, frame_info)
+    return buffer.tobytes()
+
+
+class FrameBroadcaster(threading.Thread):
+    """
+    One producer per camera that renders each new frame exactly once.
+
+    The thread reads `fall_cam:{cam_id}`, decodes the frame, runs `render`
+    on it and JPEG-encodes the result into a single latest-frame slot. Any
+    number of HTTP clients wait on the condition variable for the next frame;
+    a client that is slower than the camera simply skips to the newest frame
+    (counted in `dropped`), so it never holds back the producer or the other
+    clients.
+    """
+
+    def __init__(self, conn, cam_id, render, policy, block_ms, latency=None):
+        super().__init__(daemon=True, name=f"broadcast-{cam_id}")
+        self.conn = conn
+        self.cam_id = cam_id
+        self.key = f"fall_cam:{cam_id}"
+        self.render = render
+        self.policy = policy
+        self.block_ms = block_ms
+        self.latency = latency
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.jpeg = None
+        self.seq = 0  # number of frames encoded so far
+        self.subscribers = 0
+        self.dropped = 0
+        self.idle_since = time.time()
+
+    def publish(self, jpeg):
+        with self.condition:
+            self.jpeg = jpeg
+            self.seq += 1
+            self.condition.notify_all()
+
+    def produce(self, reader, frames):
+        entries = reader.read().get(self.key, [])
+        received_at = time.time()
+        for _, data in entries:
+            jpeg = render_jpeg(data, frames, self.render, self.cam_id, self.latency, received_at)
+            if jpeg is not None:
+                self.publish(jpeg)
+
+    def run(self):
+        reader = StreamReader(self.conn, self.key, policy=self.policy, block_ms=self.block_ms)
+        frames = FrameResolver()
+        while not self.stopped.is_set():
+            try:
+                self.produce(reader, frames)
+            except Exception as e:
+                logger.error(f"Broadcaster for cam {self.cam_id} failed: {e}")
+                self.stopped.wait(1.0)
+        with self.condition:
+            self.condition.notify_all()
+
+    def stop(self):
+        self.stopped.set()
+
+    def next_frame(self, last_seq, timeout=None):
+        """Blocks until a frame newer than `last_seq` exists; returns (seq, jpeg), jpeg is None on timeout/stop."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq != last_seq or self.stopped.is_set(), timeout)
+            if self.seq == last_seq:
+                return last_seq, None
+            if last_seq:
+                self.dropped += self.seq - last_seq - 1
+            return self.seq, self.jpeg
+
+    def subscribe(self):
+        """MJPEG multipart chunks for one client; it counts as a subscriber once the generator starts."""
+        with self.condition:
+            if not self.subscribers:
+                # restart the idle clock, so the reaper leaves it running until the client starts reading
+                self.idle_since = time.time()
+        return self.stream()
+
+    def stream(self):
+        # counted here, not in subscribe(): a generator closed before its first next() never runs `finally`
+        with self.condition:
+            self.subscribers += 1
+            self.idle_since = None
+        try:
+            last_seq = 0
+            while not self.stopped.is_set():
+                seq, jpeg = self.next_frame(last_seq, timeout=1.0)
+                if jpeg is None:
+                    continue
+                last_seq = seq
+                yield BOUNDARY + jpeg + b"\r\n"
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+                if not self.subscribers:
+                    self.idle_since = time.time()
+
+    def stats(self):
+        return {"subscribers": self.subscribers, "frames": self.seq, "dropped": self.dropped}
+
+
+class BroadcasterRegistry:
+    """
+    Lazily started broadcasters, one per camera that is being watched.
+
+    `subscribe(cam_id)` starts the camera's producer on first use; a reaper
+    thread stops producers that have had no subscribers for `idle_timeout`
+    seconds, so only watched cameras cost CPU.
+    """
+
+    def __init__(self, conn, render, policy, block_ms, idle_timeout=30.0, latency=None):
+        self.conn = conn
+        self.render = render  # cam_id -> render(frame, frame_info)
+        self.policy = policy
+        self.block_ms = block_ms
+        self.idle_timeout = idle_timeout
+        self.latency = latency
+        self.broadcasters = {}
+        self.lock = threading.Lock()
+        self.reaper = threading.Thread(target=self.reap, daemon=True, name="broadcast-reaper")
+        self.reaper.start()
+
+    def subscribe(self, cam_id):
+        with self.lock:
+            broadcaster = self.broadcasters.get(cam_id)
+            if broadcaster is None:
+                broadcaster = FrameBroadcaster(self.conn, cam_id, self.render(cam_id), policy=self.policy,
+                                               block_ms=self.block_ms, latency=self.latency)
+                broadcaster.start()
+                self.broadcasters[cam_id] = broadcaster
+                logger.info(f"Started render worker for cam {cam_id}")
+            # under the lock so the reaper cannot stop it in between
+            return broadcaster.subscribe()
+
+    def reap(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 5.0))
+            now = time.time()
+            with self.lock:
+                for cam_id, broadcaster in list(self.broadcasters.items()):
+                    idle_since = broadcaster.idle_since
+                    if idle_since is not None and now - idle_since >= self.idle_timeout:
+                        broadcaster.stop()
+                        del self.broadcasters[cam_id]
+                        logger.info(f"Stopped idle render worker for cam {cam_id}")
+
+    def stats(self):
+        with self.lock:
+            cameras = {cam_id: broadcaster.stats() for cam_id, broadcaster in self.broadcasters.items()}
+        return {
+            "active_workers": len(cameras),
+            "subscribers": sum(camera["subscribers"] for camera in cameras.values()),
+            "cameras": cameras,
+        }
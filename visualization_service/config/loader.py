@@ -25,7 +25,14 @@ cfg = load_config()
 REDIS_HOSTNAME = cfg["redis"]["HOSTNAME"]
 REDIS_PORT = cfg["redis"]["PORT"]
 STREAMMAXLEN = cfg["stream"]["STREAMMAXLEN"]
+READ_POLICY = cfg["stream"]["read_policy"]
+READ_BLOCK_MS = cfg["stream"]["block_ms"]
 CAMERAS = cfg["cameras"]
+IDLE_TIMEOUT = cfg["broadcast"]["idle_timeout"]
+FALLS_DIR = cfg["snapshots"]["directory"]
+SNAPSHOT_COOLDOWN = cfg["snapshots"]["cooldown"]
+SNAPSHOT_MAX_QUEUE = cfg["snapshots"]["max_queue"]
+LATENCY_LOG_INTERVAL = cfg["latency"]["log_interval"]
 
 THICKNESS = cfg["draw_params"]["THICKNESS"]
 TEXTTHICKNESS = cfg["draw_params"]["TEXTTHICKNESS"]
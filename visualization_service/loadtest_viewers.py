@@ -0,0 +1,143 @@
+"""
+Concurrent MJPEG viewers against a running visualization server.
+
+    python loadtest_viewers.py --viewers 10 100 500 --duration 20
+    python loadtest_viewers.py --path /video_feed/CAM1 --publish --fps 20
+
+Every viewer is a raw asyncio connection that counts the multipart frames it
+receives, so the load generator itself stays cheap. For each viewer count it
+prints the per-client frame rate (min / median / mean) and the server's CPU
+utilisation, taken from the cpu_seconds field of /stats before and after the
+run (100% = one core). With --publish, synthetic frames are pushed into
+fall_cam:{cam} so the test does not need cameras or the other services.
+Run it from another machine where possible; otherwise it competes with the
+server for CPU.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import cv2
+import numpy as np
+import redis.asyncio as aioredis
+
+import frame_codec
+
+MARKER = b"--frame\r\n"
+
+
+async def http_get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def viewer(host, port, path, duration):
+    """Frames received in `duration` seconds, None if the request failed."""
+    loop = asyncio.get_running_loop()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        status = await reader.readuntil(b"\r\n\r\n")
+    except (OSError, asyncio.IncompleteReadError):
+        return None
+    if b" 200 " not in status.split(b"\r\n", 1)[0]:
+        writer.close()
+        return None
+
+    frames = 0
+    tail = b""
+    deadline = loop.time() + duration
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            chunk = await asyncio.wait_for(reader.read(1 << 16), remaining)
+        except asyncio.TimeoutError:
+            break
+        if not chunk:
+            break
+        data = tail + chunk
+        frames += data.count(MARKER)
+        tail = data[-(len(MARKER) - 1):]
+    writer.close()
+    return frames
+
+
+def make_message(frame, people, rng):
+    objects = frame_codec.empty_objects(people)
+    objects["id"] = np.arange(people)
+    top_left = rng.integers(0, [frame.shape[1] - 80, frame.shape[0] - 200], (people, 2))
+    objects["bbox"] = np.hstack([top_left, top_left + [80, 200]])
+    objects["keypoints"] = top_left[:, None] + rng.random((people, frame_codec.NUM_KEYPOINTS, 2)) * [80, 200]
+    frame_info = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "starttime": time.time(), "fps": 20.0,
+                  "objects": objects}
+    return {"frame": cv2.imencode(".jpg", frame)[1].tobytes(), "frame_info": frame_codec.encode(frame_info)}
+
+
+async def publish(conn, cam_id, fps, people, width, height):
+    rng = np.random.default_rng(0)
+    # smooth gradient, so JPEG sizes are close to a real scene rather than noise
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    frame = np.dstack(np.broadcast_arrays(x[None, :], y[:, None], (x[None, :] // 2 + y[:, None] // 2)))
+    while True:
+        await conn.xadd(f"fall_cam:{cam_id}", make_message(frame, people, rng), maxlen=2)
+        await asyncio.sleep(1 / fps)
+
+
+async def run(args):
+    publisher = None
+    if args.publish:
+        conn = aioredis.Redis(host=args.redis_host, port=args.redis_port)
+        publisher = asyncio.ensure_future(publish(conn, args.cam, args.fps, args.people, args.width, args.height))
+    path = args.path or f"/video_feed/{args.cam}"
+
+    print(f"{'viewers':>8} {'served':>7} {'min fps':>8} {'p50 fps':>8} {'mean fps':>9} {'server cpu':>11}")
+    for viewers in args.viewers:
+        before = await http_get_json(args.host, args.port, "/stats")
+        start = time.time()
+        counts = await asyncio.gather(*(viewer(args.host, args.port, path, args.duration) for _ in range(viewers)))
+        elapsed = time.time() - start
+        after = await http_get_json(args.host, args.port, "/stats")
+
+        rates = [count / args.duration for count in counts if count is not None]
+        cpu = 100 * (after["cpu_seconds"] - before["cpu_seconds"]) / elapsed
+        if rates:
+            print(f"{viewers:>8} {len(rates):>7} {min(rates):>8.1f} {statistics.median(rates):>8.1f} "
+                  f"{statistics.mean(rates):>9.1f} {cpu:>10.0f}%")
+        else:
+            print(f"{viewers:>8} {0:>7} {'-':>8} {'-':>8} {'-':>9} {cpu:>10.0f}%")
+
+    if publisher is not None:
+        publisher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--cam", default="CAM1")
+    parser.add_argument("--path", default=None, help="defaults to /video_feed/<cam>")
+    parser.add_argument("--viewers", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--publish", action="store_true", help="push synthetic frames into fall_cam:<cam>")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
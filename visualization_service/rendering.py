@@ -0,0 +1,55 @@
+# Frame rendering shared by server_flask.py and server_asgi.py
+from supervision import ColorPalette
+
+from config.loader import (
+    FALLS_DIR,
+    SNAPSHOT_COOLDOWN,
+    SNAPSHOT_MAX_QUEUE,
+    LATENCY_LOG_INTERVAL,
+    THICKNESS,
+    TEXTTHICKNESS,
+    TEXTSCALE,
+)
+from annotators import Annotator
+from snapshots import FallEventIndex, SnapshotWriter
+from latency import LatencyRecorder
+
+annotator = Annotator(
+    color=ColorPalette(10),
+    thickness=THICKNESS,
+    text_thickness=TEXTTHICKNESS,
+    text_scale=TEXTSCALE,
+    anchor="center"
+)
+
+def drawing(frame, frame_info):
+    objects = frame_info["objects"]
+    fps=frame_info['fps']
+    if len(objects):
+        frame = annotator.annotate(
+            scene=frame,
+            detections=objects,
+            fps=fps
+        )
+    return frame
+
+latency = LatencyRecorder("visualization", LATENCY_LOG_INTERVAL)
+
+fall_index = FallEventIndex(FALLS_DIR)
+snapshots = SnapshotWriter(FALLS_DIR, fall_index, cooldown=SNAPSHOT_COOLDOWN, max_queue=SNAPSHOT_MAX_QUEUE)
+snapshots.start()
+
+def save_falls(cam_id, frame, frame_info):
+    objects = frame_info["objects"]
+    if not len(objects):
+        return
+    # debounced per (camera, track id) and written in the background
+    for track_id in objects["id"][objects["fall_detected"]]:
+        snapshots.submit(cam_id, int(track_id), frame)
+
+def render(cam_id):
+    def render_frame(frame, frame_info):
+        frame = drawing(frame, frame_info)
+        save_falls(cam_id, frame, frame_info)
+        return frame
+    return render_frame
@@ -0,0 +1,114 @@
+import time
+from contextlib import asynccontextmanager
+
+import uvicorn
+import redis.asyncio as aioredis
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+
+from config.loader import REDIS_HOSTNAME, REDIS_PORT, CAMERAS
+from config.loader import READ_POLICY, READ_BLOCK_MS, IDLE_TIMEOUT
+from logs.log_handler import logger
+from async_broadcaster import AsyncBroadcasterRegistry
+from rendering import render, fall_index, latency
+
+# Same routes as server_flask.py, served by one asyncio process: viewers are
+# coroutines instead of threads, and Redis is read with redis.asyncio.
+
+r = aioredis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT)
+
+camera_ids = [camera['id'] for camera in CAMERAS]
+broadcasters = AsyncBroadcasterRegistry(r, render, policy=READ_POLICY, block_ms=READ_BLOCK_MS,
+                                        idle_timeout=IDLE_TIMEOUT, latency=latency)
+
+templates = Jinja2Templates(directory="templates")
+
+
+def url_for(endpoint, **values):
+    """Flask-style url_for so templates/index.html works under both servers."""
+    if endpoint == "static":
+        return f"/static/{values['filename']}"
+    return app.url_path_for(endpoint, **values)
+
+
+templates.env.globals["url_for"] = url_for
+
+
+def query_param(request, name, cast):
+    try:
+        return cast(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+async def index(request):
+    return templates.TemplateResponse(request, "index.html", {"fall_events": fall_index.query()})
+
+
+async def fall_events(request):
+    since = query_param(request, "since", float)
+    after = query_param(request, "after", str)
+    limit = query_param(request, "limit", int)
+    if limit is not None and limit < 0:
+        raise HTTPException(status_code=400)
+    return JSONResponse(fall_index.query(since=since, after=after, limit=limit))
+
+
+def feed(cam_id):
+    if cam_id not in camera_ids:
+        raise HTTPException(status_code=404)
+    return StreamingResponse(broadcasters.subscribe(cam_id), media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+async def video_feed(request):
+    return feed(request.path_params["cam_id"])
+
+
+# Kept for existing pages: the first two configured cameras
+async def video_feed_1(request):
+    return feed(camera_ids[0])
+
+
+async def video_feed_2(request):
+    return feed(camera_ids[1])
+
+
+async def stats(request):
+    # process CPU seconds, sampled twice by load tests to get utilisation
+    return JSONResponse(dict(broadcasters.stats(), cpu_seconds=time.process_time()))
+
+
+async def metrics(request):
+    return PlainTextResponse(latency.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    broadcasters.start()
+    yield
+    broadcasters.stop()
+    await r.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/fall_events", fall_events),
+        Route("/video_feed/{cam_id}", video_feed),
+        Route("/video_feed_1", video_feed_1),
+        Route("/video_feed_2", video_feed_2),
+        Route("/stats", stats),
+        Route("/metrics", metrics),
+        Mount("/static", StaticFiles(directory="static", check_dir=False), name="static"),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    logger.info("Serving visualization on 0.0.0.0:5000 (asgi)")
+    uvicorn.run(app, host="0.0.0.0", port=5000)
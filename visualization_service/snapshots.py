@@ -0,0 +1,153 @@
+import os
+import time
+import queue
+import bisect
+import threading
+from datetime import datetime
+
+import cv2
+
+from logs.log_handler import logger
+
+TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def parse_snapshot_name(fname):
+    """Event for `camId_YYYY-MM-DD_HH-MM-SS[_trackId].jpg`, None for other files."""
+    if not fname.endswith(".jpg"):
+        return None
+    try:
+        cam_id, rest = fname[:-len(".jpg")].split("_", 1)
+        time_str, track_id = rest[:19], rest[20:]
+        timestamp = datetime.strptime(time_str, TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+    return make_event(fname, cam_id, track_id or None, timestamp)
+
+
+def make_event(fname, cam_id, track_id, timestamp):
+    return {
+        "image_path": f"falls/{fname}",
+        "time": time.strftime(TIME_FORMAT, time.localtime(timestamp)).replace("_", " "),
+        "camera": cam_id,
+        "track_id": track_id,
+        "timestamp": timestamp,
+    }
+
+
+def event_key(event):
+    return event["timestamp"], event["image_path"]
+
+
+class FallEventIndex:
+    """
+    Fall events ordered by (timestamp, image_path), kept in memory next to
+    the snapshot files.
+
+    Built once from the directory listing at startup; after that the
+    snapshot writer adds every file it saves, so requests never touch the
+    disk.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.keys = []  # sorted (timestamp, image_path), parallel to `events`
+        self.times = []  # the timestamps of `keys`
+        self.events = []
+        self.rebuild()
+
+    def rebuild(self):
+        events = []
+        if os.path.isdir(self.directory):
+            events = [parse_snapshot_name(fname) for fname in os.listdir(self.directory)]
+        events = sorted((e for e in events if e is not None), key=event_key)
+        with self.lock:
+            self.events = events
+            self.keys = [event_key(e) for e in events]
+            self.times = [e["timestamp"] for e in events]
+        logger.info(f"Indexed {len(events)} fall events from {self.directory}")
+
+    def add(self, event):
+        key = event_key(event)
+        with self.lock:
+            i = bisect.bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.times.insert(i, event["timestamp"])
+            self.events.insert(i, event)
+
+    def __len__(self):
+        return len(self.events)
+
+    def query(self, since=None, after=None, limit=None):
+        """
+        Without `since`: the newest events first (the `limit` most recent).
+        With `since` (epoch seconds): events after it, oldest first. To page
+        through them pass the last event's `timestamp` as `since` and its
+        `image_path` as `after`: events with the same timestamp (snapshot
+        names only have whole seconds) are then neither skipped nor repeated.
+        With `since` alone every event at exactly `since` is skipped. A
+        negative `limit` counts as 0.
+        """
+        with self.lock:
+            if since is None:
+                events = self.events[::-1]
+            elif after is None:
+                events = self.events[bisect.bisect_right(self.times, since):]
+            else:
+                events = self.events[bisect.bisect_right(self.keys, (since, after)):]
+        return events[:max(0, limit)] if limit is not None else events
+
+
+class SnapshotWriter(threading.Thread):
+    """
+    Saves fall snapshots off the streaming thread.
+
+    `submit` is called for every frame with a fallen person; it keeps at most
+    one snapshot per (camera, track id) every `cooldown` seconds and only
+    queues the frame. JPEGs are written by this thread and then added to the
+    event index. When the queue is full, snapshots are dropped and counted.
+    """
+
+    def __init__(self, directory, index, cooldown=10.0, max_queue=64):
+        super().__init__(daemon=True, name="fall-snapshots")
+        self.directory = directory
+        self.index = index
+        self.cooldown = cooldown
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.last_saved = {}  # (cam_id, track_id) -> time of the last accepted snapshot
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.debounced = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, cam_id, track_id, frame, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        key = (cam_id, track_id)
+        with self.lock:
+            if timestamp - self.last_saved.get(key, float("-inf")) < self.cooldown:
+                self.debounced += 1
+                return False
+            self.last_saved[key] = timestamp
+            if len(self.last_saved) > 1024:
+                self.last_saved = {k: t for k, t in self.last_saved.items() if timestamp - t < self.cooldown}
+        try:
+            self.queue.put_nowait((cam_id, track_id, frame, timestamp))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def save(self, cam_id, track_id, frame, timestamp):
+        fname = f"{cam_id}_{time.strftime(TIME_FORMAT, time.localtime(timestamp))}_{track_id}.jpg"
+        if not cv2.imwrite(os.path.join(self.directory, fname), frame):
+            logger.error(f"Failed to save fall snapshot {fname}")
+            return
+        self.saved += 1
+        self.index.add(make_event(fname, cam_id, str(track_id), timestamp))
+        logger.info(f"Fall detected - saved: {fname}")
+
+    def run(self):
+        while True:
+            self.save(*self.queue.get())
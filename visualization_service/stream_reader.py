@@ -0,0 +1,190 @@
+import time
+import asyncio
+
+from logs.log_handler import logger
+
+LATEST_ONLY = "latest"
+EVERY_FRAME = "every"
+
+
+class StreamReader:
+    """
+    Blocking, cursor-based reader for one or more Redis streams.
+
+    Each stream keeps its own last delivered ID, so nothing that is still in
+    the stream is skipped between two reads. With the `latest` policy only the
+    newest entry per stream is delivered and the older ones are counted as
+    dropped; with `every` all entries are delivered in order.
+
+    When `group` is set the reader uses XREADGROUP with `consumer`, and every
+    delivered entry is acknowledged right away.
+
+    Redis errors are logged and `read` returns nothing after sleeping, with
+    the delay doubling up to `max_error_delay` seconds while Redis stays
+    unreachable, so callers' read loops do not spin.
+    """
+
+    def __init__(self, conn, keys, policy=LATEST_ONLY, block_ms=1000, count=None,
+                 start_id="$", group=None, consumer=None, stats_interval=60, max_error_delay=5.0):
+        if policy not in (LATEST_ONLY, EVERY_FRAME):
+            raise ValueError(f"Unknown read policy: {policy}")
+        self.conn = conn
+        self.policy = policy
+        self.block_ms = block_ms
+        self.count = count
+        self.start_id = start_id
+        self.group = group
+        self.consumer = consumer
+        self.stats_interval = stats_interval
+        self.last_stats_time = time.time()
+        self.max_error_delay = max_error_delay
+        self.error_delay = 0.0
+        self.cursors = {}
+        self.delivered = {}
+        self.dropped = {}
+        for key in ([keys] if isinstance(keys, str) else keys):
+            self.add_key(key)
+
+    def add_key(self, key, start_id=None):
+        if key in self.cursors:
+            return
+        start_id = start_id or self.start_id
+        if self.group is None and start_id == "$":
+            start_id = self.pin(key)
+        if self.group is not None:
+            try:
+                self.conn.xgroup_create(key, self.group, id=start_id, mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    # Created on the first read that fails with NOGROUP
+                    logger.error(f"Error creating group {self.group} on {key}: {e}")
+            start_id = ">"
+        self.cursors[key] = start_id
+        self.delivered.setdefault(key, 0)
+        self.dropped.setdefault(key, 0)
+
+    def pin(self, key):
+        """The last entry ID of `key`, so entries added between two reads are not lost; "$" if Redis fails."""
+        try:
+            last = self.conn.xrevrange(key, count=1)
+        except Exception as e:
+            logger.error(f"Error reading the last entry of {key}: {e}")
+            return "$"  # pinned again before the next read
+        return last[0][0] if last else "0-0"
+
+    def remove_key(self, key):
+        self.cursors.pop(key, None)
+
+    def recreate_groups(self):
+        """Creates the group again on streams that were deleted (e.g. a camera restarted by an update)."""
+        for key in list(self.cursors):
+            self.cursors.pop(key)
+            self.add_key(key)
+
+    def last_id(self, key):
+        return self.cursors.get(key)
+
+    def _read(self, block_ms):
+        if self.group is not None:
+            return self.conn.xreadgroup(self.group, self.consumer, dict(self.cursors),
+                                        count=self.count, block=block_ms)
+        return self.conn.xread(dict(self.cursors), count=self.count, block=block_ms)
+
+    def read(self, block_ms=None):
+        """Returns {key: [(entry_id, fields), ...]} for streams with new entries."""
+        block_ms = self.block_ms if block_ms is None else block_ms
+        if not self.cursors:
+            # Nothing to read (every camera removed): wait instead of spinning
+            time.sleep(block_ms / 1000.0)
+            return {}
+        try:
+            if self.group is None:
+                for key, cursor in self.cursors.items():
+                    if cursor == "$":
+                        self.cursors[key] = self.pin(key)
+            response = self._read(block_ms)
+        except Exception as e:
+            delay = self.backoff(e)
+            if self.group is not None and "NOGROUP" in str(e):
+                self.recreate_groups()
+            time.sleep(delay)
+            return {}
+        self.error_delay = 0.0
+        return self.deliver(response)
+
+    def backoff(self, error):
+        """Logs a failed read and returns how long to wait before the next one."""
+        self.error_delay = min(self.max_error_delay, max(0.1, 2 * self.error_delay))
+        logger.error(f"Error reading streams {list(self.cursors)}, retrying in {self.error_delay:.1f}s: {error}")
+        return self.error_delay
+
+    def deliver(self, response):
+        """Advances the cursors past an XREAD/XREADGROUP response and applies the read policy."""
+        batch = {}
+        for key, entries in response or []:
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            if key not in self.cursors or not entries:
+                continue
+            if self.group is not None:
+                try:
+                    self.conn.xack(key, self.group, *[entry_id for entry_id, _ in entries])
+                except Exception as e:
+                    # Delivered all the same; the entries stay pending in the group
+                    logger.error(f"Error acknowledging {len(entries)} entries of {key}: {e}")
+            else:
+                self.cursors[key] = entries[-1][0]
+            if self.policy == LATEST_ONLY:
+                self.dropped[key] += len(entries) - 1
+                entries = entries[-1:]
+            self.delivered[key] += len(entries)
+            batch[key] = entries
+
+        if self.stats_interval and time.time() - self.last_stats_time >= self.stats_interval:
+            self.last_stats_time = time.time()
+            logger.info(f"Stream reader stats: {self.stats()}")
+        return batch
+
+    def stats(self):
+        return {
+            key: {"delivered": self.delivered[key], "dropped": self.dropped[key]}
+            for key in self.cursors
+        }
+
+
+class AsyncStreamReader(StreamReader):
+    """
+    StreamReader for a `redis.asyncio` client, with the same cursors, read
+    policy, stats and error backoff; `read` is a coroutine. Consumer groups
+    are not supported.
+    """
+
+    def __init__(self, conn, keys, policy=LATEST_ONLY, block_ms=1000, count=None, start_id="$",
+                 stats_interval=60, max_error_delay=5.0):
+        super().__init__(conn, keys, policy=policy, block_ms=block_ms, count=count, start_id=start_id,
+                         stats_interval=stats_interval, max_error_delay=max_error_delay)
+
+    def add_key(self, key, start_id=None):
+        if key in self.cursors:
+            return
+        # "$" is pinned to a concrete ID before the first read, where it can be awaited
+        self.cursors[key] = start_id or self.start_id
+        self.delivered.setdefault(key, 0)
+        self.dropped.setdefault(key, 0)
+
+    async def read(self, block_ms=None):
+        """Returns {key: [(entry_id, fields), ...]} for streams with new entries."""
+        block_ms = self.block_ms if block_ms is None else block_ms
+        if not self.cursors:
+            await asyncio.sleep(block_ms / 1000.0)
+            return {}
+        try:
+            for key, cursor in list(self.cursors.items()):
+                if cursor == "$":
+                    last = await self.conn.xrevrange(key, count=1)
+                    self.cursors[key] = last[0][0] if last else "0-0"
+            response = await self.conn.xread(dict(self.cursors), count=self.count, block=block_ms)
+        except Exception as e:
+            await asyncio.sleep(self.backoff(e))
+            return {}
+        self.error_delay = 0.0
+        return self.deliver(response)